@@ -25,6 +25,10 @@ def parse_args(args):
     config_parser = subparsers.add_parser('config', help='configuration mode')
     run_parser = subparsers.add_parser('run', help='run mode')
 
+    # interactive parser
+    interactive_parser.add_argument('--seed', type=int, help='seed of the random number generator, the same seed '
+                                                             'and configuration always generate the same domain')
+
     # config parser
     config_parser.add_argument('--conn', type=str, required=True, help='absolute path to the file containing the '
                                                                        'parameters necessary for the connection to '
@@ -38,14 +42,69 @@ def parse_args(args):
                                                                         'information about acls, groups and ous ('
                                                                         'along with their frequencies)')
     config_parser.add_argument('--nodes-distr', type=str, help='distribution of nodes to generate')
+    config_parser.add_argument('--export-csv', type=str, help='directory where to write the generated data as CSV '
+                                                              'files for neo4j-admin import, instead of writing '
+                                                              'it to the database')
+    config_parser.add_argument('--export-json', type=str, help='path of a JSON file where to write the generated '
+                                                               'data, instead of writing it to the database')
+    config_parser.add_argument('--defer-schema', action='store_true', help='create the constraints and indexes '
+                                                                          'only after the nodes have been written '
+                                                                          'to the cleared database')
+    config_parser.add_argument('--recreate-db', action='store_true', help='drop and recreate the database instead '
+                                                                         'of deleting its content, if the server '
+                                                                         'allows it')
+    config_parser.add_argument('--batch-size', type=int, help='maximum number of rows sent to the database by '
+                                                              'each statement (overrides batch_size in the '
+                                                              'connection file)')
+    config_parser.add_argument('--transactions', action='store_true', help='write each batch in an explicit '
+                                                                          'transaction, retried on transient '
+                                                                          'errors')
+    config_parser.add_argument('--workers', type=int, help='number of threads writing batches to the database '
+                                                           'concurrently (overrides workers in the connection '
+                                                           'file)')
+    config_parser.add_argument('--async', dest='async_mode', action='store_true', help='write the batches with the '
+                                                                                      'async driver while the '
+                                                                                      'domain is generated')
+    config_parser.add_argument('--seed', type=int, help='seed of the random number generator, the same seed and '
+                                                        'configuration always generate the same domain')
+    config_parser.add_argument('--processes', type=int, help='number of processes generating users, computers and '
+                                                             'groups in parallel (overrides processes in the '
+                                                             'connection file)')
+    config_parser.add_argument('--domains', type=int, help='number of domains of the forest to generate, linked by '
+                                                           'trusts (overrides domains in the connection file)')
 
     # run parser
-    run_parser.add_argument('--url', type=str, required=True, help='database URL to connect to')
-    run_parser.add_argument('--user', type=str, required=True, help='database Username')
-    run_parser.add_argument('--passwd', type=str, required=True, help='database Password')
+    run_parser.add_argument('--url', type=str, help='database URL to connect to')
+    run_parser.add_argument('--user', type=str, help='database Username')
+    run_parser.add_argument('--passwd', type=str, help='database Password')
     run_parser.add_argument('--domain', type=str, required=True, help='name of the domain to generate')
     run_parser.add_argument('--nodes-val', type=int, help='number of nodes to generate')
     run_parser.add_argument('--nodes-distr', type=str, help='distribution of nodes to generate')
+    run_parser.add_argument('--export-csv', type=str, help='directory where to write the generated data as CSV '
+                                                           'files for neo4j-admin import, instead of writing it '
+                                                           'to the database')
+    run_parser.add_argument('--export-json', type=str, help='path of a JSON file where to write the generated data, '
+                                                            'instead of writing it to the database')
+    run_parser.add_argument('--defer-schema', action='store_true', help='create the constraints and indexes only '
+                                                                       'after the nodes have been written to the '
+                                                                       'cleared database')
+    run_parser.add_argument('--recreate-db', action='store_true', help='drop and recreate the database instead of '
+                                                                      'deleting its content, if the server allows it')
+    run_parser.add_argument('--batch-size', type=int, help='maximum number of rows sent to the database by each '
+                                                           'statement')
+    run_parser.add_argument('--transactions', action='store_true', help='write each batch in an explicit '
+                                                                       'transaction, retried on transient errors')
+    run_parser.add_argument('--workers', type=int, help='number of threads writing batches to the database '
+                                                        'concurrently')
+    run_parser.add_argument('--async', dest='async_mode', action='store_true', help='write the batches with the '
+                                                                                   'async driver while the domain '
+                                                                                   'is generated')
+    run_parser.add_argument('--seed', type=int, help='seed of the random number generator, the same seed and '
+                                                     'configuration always generate the same domain')
+    run_parser.add_argument('--processes', type=int, help='number of processes generating users, computers and '
+                                                          'groups in parallel')
+    run_parser.add_argument('--domains', type=int, help='number of domains of the forest to generate, linked by '
+                                                        'trusts')
 
     if len(args) == 0:
         parser.print_help(sys.stderr)
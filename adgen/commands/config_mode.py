@@ -1,8 +1,5 @@
-import yaml
 import os.path
 
-from adgen.initializer import initialize
-from adgen.db import clear_and_generate
 from adgen.utils.loader import check_ini_file
 
 
@@ -28,6 +25,8 @@ def check_config_args(args):
         if not os.path.exists(path_to_check):
             raise Exception(f"ERROR: Reading From File: file {path_to_check} does not exist")
 
+        import yaml
+
         with open(path_to_check) as fh:
             data = yaml.load(fh, Loader=yaml.FullLoader)
 
@@ -63,8 +62,16 @@ def config(args):
     check = check_ini_file(path_to_check)
 
     if check == 0:
+        # The generators and the driver are only needed once the arguments are valid
+        from adgen.initializer import initialize
+        from adgen.db import clear_and_generate, export_data
+
         db_settings, domain_settings, pool = initialize(args)
-        clear_and_generate(db_settings, domain_settings, pool)
+
+        if args.get('export_csv') is not None or args.get('export_json') is not None:
+            export_data(domain_settings, pool, args.get('export_csv'), args.get('export_json'))
+        else:
+            clear_and_generate(db_settings, domain_settings, pool)
     elif check == -1:
         raise Exception(f"Reading from File: {path_to_check} seems to return incorrect sections")
     elif check == -2:
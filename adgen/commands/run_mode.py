@@ -1,7 +1,5 @@
 import os
 
-from adgen.initializer import initialize
-from adgen.db import clear_and_generate
 from adgen.utils.loader import check_ini_file
 
 
@@ -9,11 +7,17 @@ def check_run_args(args):
     """
     This function checks whether the user has entered --nodes-val or
     --nodes-distr and, in the latter case, checks whether the inserted
-    distribution is valid.
+    distribution is valid. Unless the data is exported to files, it
+    also checks that the database credentials have been entered.
 
     Arguments:
         args -- the list of arguments passed from the command line
     """
+    if args.get('export_csv') is None and args.get('export_json') is None:
+        for option, name in (('url', '--url'), ('user', '--user'), ('passwd', '--passwd')):
+            if args.get(option) is None:
+                raise Exception(f"Missing {name} option. It is required unless you use --export-csv or --export-json")
+
     if args.get('nodes_val') is None and args.get('nodes_distr') is None:
         raise Exception("Missing nodes option. You can either use --nodes-val or -nodes-distr")
     elif args.get('nodes_val') is not None and args.get('nodes_distr') is not None:
@@ -44,8 +48,16 @@ def run(args):
     check = check_ini_file(path_to_check)
 
     if check == 0:
+        # The generators and the driver are only needed once the arguments are valid
+        from adgen.initializer import initialize
+        from adgen.db import clear_and_generate, export_data
+
         db_settings, domain_settings, pool = initialize(args)
-        clear_and_generate(db_settings, domain_settings, pool)
+
+        if args.get('export_csv') is not None or args.get('export_json') is not None:
+            export_data(domain_settings, pool, args.get('export_csv'), args.get('export_json'))
+        else:
+            clear_and_generate(db_settings, domain_settings, pool)
     elif check == -1:
         raise Exception(f"Reading from File: {path_to_check} seems to return incorrect sections")
     elif check == -2:
@@ -1,6 +1,9 @@
-import uuid
+import copy
+import random
+import types
+
+from concurrent.futures import ThreadPoolExecutor
 
-from neo4j import GraphDatabase
 from adgen.generators.acls import add_standard_edges, add_domain_admin_to_local_admin, add_local_admin_rights, \
      add_domain_admin_aces, add_outbound_acls
 from adgen.generators.computers import create_computers, create_dcs, add_rdp_dcom_delegate, add_sessions, \
@@ -9,9 +12,17 @@ from adgen.generators.gpos import create_default_gpos, create_gpos, link_to_ous
 from adgen.generators.groups import data_generation, create_groups, add_domain_admins, create_nested_groups, \
      add_users_to_group
 from adgen.generators.ous import create_dcs_ous, create_computers_ous, create_users_ous, link_ous_to_domain
-from adgen.generators.users import create_users, add_kerberoastable_users
-from adgen.utils.distributions import interactive_uniform, interactive_triangular, interactive_gauss, interactive_gamma
+from adgen.generators.trusts import add_trusts
+from adgen.generators.users import create_users, add_kerberoastable_users, set_name_pools
+from adgen.utils.distributions import interactive_uniform, interactive_triangular, interactive_gauss, interactive_gamma, \
+     generate_random_value
 from adgen.utils.printer import print_help, print_db_settings
+from adgen.utils.support_functions import gc_paused, generate_guid, shard_executor
+from adgen.entities.domain_graph import DomainGraph
+from adgen.writers.csv_writer import CsvWriter
+from adgen.writers.json_writer import JsonWriter
+from adgen.writers.neo4j_writer import Neo4jWriter, ParallelNeo4jWriter, clear_database, create_schema, drop_schema, \
+     edge_statements, recreate_database
 
 
 fixed_generation = False
@@ -134,7 +145,14 @@ def connect(db_settings):
 
 def cleardb(db_settings, args):
     """
-    Clears the database.
+    Clears the database and sets the schema, i.e., the constraints
+    and the indexes used while generating data. If the schema is
+    deferred, it is dropped instead and only set again once the
+    nodes have been generated.
+
+    The database is cleared in bounded batches. If recreate_db is
+    set, the database is dropped and created again instead, when
+    the server allows it.
 
     Arguments:
         db_settings -- the entity containing information about the
@@ -146,13 +164,22 @@ def cleardb(db_settings, args):
         return
 
     print("Clearing Database")
+
     session = db_settings.driver.session()
 
-    session.run("match (a) -[r] -> () delete a, r")  # delete all nodes with relationships
-    session.run("match (a) delete a")  # delete nodes that have no relationships
+    if db_settings.recreate_db and recreate_database(db_settings.driver):
+        print("Database recreated")
+    else:
+        clear_database(session)
 
-    session.close()
-    print("DB Cleared and Schema Set")
+    if db_settings.defer_schema:
+        drop_schema(session)
+        session.close()
+        print("DB Cleared (schema deferred until the nodes are generated)")
+    else:
+        create_schema(session)
+        session.close()
+        print("DB Cleared and Schema Set")
 
 
 def test_db_connection(db_settings):
@@ -165,6 +192,8 @@ def test_db_connection(db_settings):
     db_settings.connected = False
     if db_settings.driver is not None:
         db_settings.driver.close()
+    from neo4j import GraphDatabase
+
     try:
         db_settings.driver = GraphDatabase.driver(db_settings.url, auth=(db_settings.username, db_settings.password))
         db_settings.connected = True
@@ -197,7 +226,9 @@ def clear_and_generate(db_settings, domain_settings, pool):  # pragma: no cover
 
 def generate_data(db_settings, domain_settings, pool):  # pragma: no cover
     """
-    Generates random data.
+    Generates random data. If more domains are requested, a forest
+    is generated, and each domain is written on its own, followed
+    by the trusts between them.
 
     Arguments:
         db_settings     -- the entity containing URL, username,
@@ -216,83 +247,358 @@ def generate_data(db_settings, domain_settings, pool):  # pragma: no cover
         print("Not connected to the database")
         return
 
-    computers = []
-    groups = []
-    users = []
-    gpos = []
-    ou_guid_map = {}
-    ou_props = []
+    if db_settings.async_mode:
+        generate_data_async(db_settings, domain_settings, pool)
+        return
+
+    forest = create_forest(domain_settings)
 
-    session = db_settings.driver.session()
+    if db_settings.workers > 1:
+        writer = ParallelNeo4jWriter(db_settings.driver, workers=db_settings.workers, batch_size=db_settings.batch_size,
+                                     defer_schema=db_settings.defer_schema, transactions=db_settings.transactions)
+    else:
+        writer = Neo4jWriter(db_settings.driver.session(), batch_size=db_settings.batch_size,
+                             defer_schema=db_settings.defer_schema, transactions=db_settings.transactions)
+
+    # Each domain of a forest is written while the next one is generated
+    with ThreadPoolExecutor(1) as executor:
+        written = None
+        for settings in forest:
+            graph = generate_domain(settings, pool)
+            if written is not None:
+                written.result()
+
+            print("Writing {} nodes and {} relationships of {} to the database".format(graph.count_nodes(),
+                                                                                      graph.count_edges(),
+                                                                                      settings.domain))
+            written = executor.submit(writer.write, graph)
+        written.result()
+
+    if len(forest) > 1:
+        graph = DomainGraph()
+        add_trusts(graph, forest[0].sid, [settings.sid for settings in forest[1:]])
+        # The domains have already been written, only the trusts are
+        writer.write_stage(edge_statements(graph, db_settings.defer_schema))
+    writer.close()
+
+    for name, (batches, rows, seconds) in writer.report().items():
+        print("{}: {} rows in {} batches ({:.2f}s)".format(name, rows, batches, seconds))
+    print_duplicates(writer.duplicates)
+
+    print("Database Generation Finished!")
 
-    print("Starting data generation with nodes={}".format(domain_settings.nodes))
-    data_generation(session, domain_settings.domain, domain_settings.sid)
 
-    ddp = str(uuid.uuid4())
-    ddcp = str(uuid.uuid4())
-    dcou = str(uuid.uuid4())
+def generate_data_async(db_settings, domain_settings, pool):  # pragma: no cover
+    """
+    Generates random data and writes it with the async driver while
+    it is generated, so that the generation of the next batches
+    overlaps with the writing of the previous ones.
+
+    Arguments:
+        db_settings     -- the entity containing URL, username,
+                           password, driver, and connected, i.e.,
+                           parameters useful for the connection to
+                           the database
+        domain_settings -- the entity containing nodes, domain,
+                           current_time and sid of the domain to generate
+        pool            -- the entity containing a pool of values
+                           used to create nodes inside the domain,
+                           i.e., a list of first names and last names,
+                           a list of client OS and server OS, a list
+                           of acls, groups, and ous
+    """
+    if db_settings.defer_schema:
+        # Nodes and relationships are written together, so the schema cannot wait
+        print("The schema cannot be deferred when writing asynchronously, setting it now")
+        session = db_settings.driver.session()
+        create_schema(session)
+        session.close()
+
+    import asyncio
+
+    from neo4j import AsyncGraphDatabase
+    from adgen.writers.async_writer import AsyncNeo4jWriter
+
+    forest = create_forest(domain_settings)
+
+    async def write():
+        driver = AsyncGraphDatabase.driver(db_settings.url, auth=(db_settings.username, db_settings.password))
+        try:
+            writer = AsyncNeo4jWriter(driver, batch_size=db_settings.batch_size,
+                                      transactions=db_settings.transactions)
+            for settings in forest:
+                graph = await writer.write(lambda graph: generate_domain(settings, pool, graph))
+                print("Wrote {} nodes and {} relationships of {} to the database".format(graph.count_nodes(),
+                                                                                       graph.count_edges(),
+                                                                                       settings.domain))
+
+            if len(forest) > 1:
+                await writer.write(lambda graph: add_trusts(graph, forest[0].sid,
+                                                            [settings.sid for settings in forest[1:]]))
+            return writer.report()
+        finally:
+            await driver.close()
+
+    report = asyncio.run(write())
+
+    for name, (batches, rows, seconds) in report.items():
+        print("{}: {} rows in {} batches ({:.2f}s)".format(name, rows, batches, seconds))
+
+    print("Database Generation Finished!")
+
+
+def export_data(domain_settings, pool, csv_path=None, json_path=None):
+    """
+    Generates random data and writes it to files, without connecting
+    to a database. The same generated domain, or forest, is written
+    to every requested file format.
+
+    Arguments:
+        domain_settings -- the entity containing nodes, domain,
+                           current_time and sid of the domain to generate
+        pool            -- the entity containing a pool of values
+                           used to create nodes inside the domain,
+                           i.e., a list of first names and last names,
+                           a list of client OS and server OS, a list
+                           of acls, groups, and ous
+        csv_path        -- the directory where the CSV files for
+                           'neo4j-admin database import' are written
+        json_path       -- the path of the JSON file to write
+    """
+    forest = create_forest(domain_settings)
+    graph = DomainGraph()
+    for settings in forest:
+        generate_domain(settings, pool, graph)
+
+    if len(forest) > 1:
+        add_trusts(graph, forest[0].sid, [settings.sid for settings in forest[1:]])
 
-    create_default_gpos(session, domain_settings.domain, ddp, ddcp)
-    create_dcs_ous(session, domain_settings.domain, dcou)
+    if csv_path is not None:
+        node_files, rel_files = CsvWriter(csv_path).write(graph)
 
-    print("Adding Standard Edges")
-    add_standard_edges(session, domain_settings.domain, dcou)
+        print("CSV Export Finished! Load the files into an empty database with:")
+        print("neo4j-admin database import full " +
+              " ".join("--nodes={}".format(f) for f in node_files) + " " +
+              " ".join("--relationships={}".format(f) for f in rel_files))
 
-    print("Generating Computer Nodes")
-    computers_props, computers, ridcount = create_computers(session, domain_settings.domain, domain_settings.sid, domain_settings.nodes, computers, pool.clients_os, fixed_generation)
+    if json_path is not None:
+        JsonWriter(json_path).write(graph)
+        print("JSON Export Finished!")
 
-    print("Creating Domain Controllers")
-    dcs_props, ridcount = create_dcs(session, domain_settings.domain, domain_settings.sid, dcou, ridcount, pool.servers_os, pool.ous)
+    print_duplicates(graph.duplicates)
 
-    print("Generating User Nodes")
-    user_props, users, ridcount = create_users(session, domain_settings.domain, domain_settings.sid, domain_settings.nodes, domain_settings.current_time, pool.first_names, pool.last_names, users, ridcount)
 
-    print("Generating Group Nodes")
-    groups_props, groups, ridcount = create_groups(session, domain_settings.domain, domain_settings.sid, domain_settings.nodes, groups, ridcount, pool.groups, fixed_generation)
+def print_duplicates(duplicates):
+    """
+    Prints how many duplicate relationships were dropped before
+    being written, for each type which had any.
 
-    print("Adding Domain Admins to Local Admins of Computers")
-    add_domain_admin_to_local_admin(session, domain_settings.sid)
+    Arguments:
+        duplicates -- a dictionary mapping each relationship type to
+                      the number of duplicates dropped
+    """
+    for rel_type, count in duplicates.items():
+        if count:
+            print("{}: {} duplicate relationships dropped".format(rel_type, count))
 
-    das = add_domain_admins(session, domain_settings.domain, domain_settings.nodes, users)
 
-    print("Applying random group nesting")
-    create_nested_groups(session, domain_settings.nodes, groups)
+def create_forest(domain_settings):
+    """
+    Creates the settings of the domains of a forest. The first domain
+    is the root of the forest; the others are its children, each one
+    with its own name, sid and seed, and sized from the distribution
+    of the nodes, if any.
 
-    print("Adding users to groups")
-    it_users = add_users_to_group(session, domain_settings.nodes, users, groups, das, pool.groups)
+    Arguments:
+        domain_settings -- the entity containing the settings of the
+                           root domain and the number of domains
 
-    print("Adding local admin rights")
-    it_groups = add_local_admin_rights(session, groups, computers)
+    Returns:
+        forest -- a list containing the settings of each domain
+    """
+    rng = random.Random(domain_settings.seed)
+    forest = [domain_settings]
 
-    print("Adding RDP/ExecuteDCOM/AllowedToDelegateTo")
-    add_rdp_dcom_delegate(session, computers, it_users, it_groups)
+    for i in range(1, domain_settings.domains):
+        settings = copy.copy(domain_settings)
+        settings.domain = "CHILD{:02d}.{}".format(i, domain_settings.domain)
+        settings.sid = "S-1-5-21-{}-{}-{}".format(rng.getrandbits(32), rng.getrandbits(32), rng.getrandbits(32))
+        if domain_settings.seed is not None:
+            settings.seed = "{}-{}".format(domain_settings.seed, settings.domain)
+        if domain_settings.distribution is not None:
+            generate_random_value(settings, *domain_settings.distribution)
+        forest.append(settings)
 
-    print("Adding sessions")
-    add_sessions(session, domain_settings.nodes, computers, users, das)
+    return forest
 
-    print("Adding Domain Admin ACEs")
-    add_domain_admin_aces(session, domain_settings.domain, computers, users, groups)
 
-    print("Creating OUs")
-    ou_props, ou_guid_map = create_computers_ous(session, domain_settings.domain, computers, ou_guid_map, ou_props, domain_settings.nodes, pool.ous)
-    ou_props, ou_guid_map = create_users_ous(session, domain_settings.domain, users, ou_guid_map, ou_props, domain_settings.nodes, pool.ous)
-    link_ous_to_domain(session, domain_settings.domain, ou_guid_map)
+def domain_stages(domain_settings, pool, executor=None):
+    """
+    Lists the stages generating a domain, in the order they run.
+    Each stage is called with the domain graph the domain is added to,
+    and the values a stage passes to the next ones (e.g., the names of
+    the users) are kept in a namespace shared by the stages. Every
+    random value is drawn from a generator seeded with the seed of
+    the domain, if any, so that the same seed generates the same domain.
 
-    print("Creating GPOs")
-    gpos = create_gpos(session, domain_settings.domain, gpos)
-    link_to_ous(session, gpos, domain_settings.domain, ou_guid_map)
-    add_outbound_acls(session, it_groups, it_users, gpos, computers, pool.acls, fixed_generation)
+    Arguments:
+        domain_settings -- the entity containing nodes, domain,
+                           current_time and sid of the domain to generate
+        pool            -- the entity containing a pool of values
+                           used to create nodes inside the domain,
+                           i.e., a list of first names and last names,
+                           a list of client OS and server OS, a list
+                           of acls, groups, and ous
+        executor        -- the process pool the shards of users, computers
+                           and groups are generated in (optional)
 
-    print("Marking some users as Kerberoastable")
-    add_kerberoastable_users(session, it_users)
+    Returns:
+        A list of (name, stage) tuples
+    """
+    domain = domain_settings.domain
+    sid = domain_settings.sid
+    nodes = domain_settings.nodes
+    rng = random.Random(domain_settings.seed)
+    state = types.SimpleNamespace()
+
+    def standard_nodes(graph):
+        # The nodes of this domain are stamped with its name as they are added,
+        # without touching the ones of the domains of the same forest
+        graph.stamp(None, {"domain": domain})
+        graph.stamp("User", {"owned": False})
+        graph.stamp("Computer", {"owned": False})
+
+        print("Starting data generation with nodes={}".format(nodes))
+        data_generation(graph, domain, sid)
+
+        ddp = generate_guid(rng)
+        ddcp = generate_guid(rng)
+        state.dcou = generate_guid(rng)
+
+        create_default_gpos(graph, domain, ddp, ddcp)
+        create_dcs_ous(graph, domain, state.dcou)
+
+        print("Adding Standard Edges")
+        add_standard_edges(graph, domain, state.dcou)
+
+    def computers(graph):
+        print("Generating Computer Nodes")
+        state.computers, state.ridcount = create_computers(graph, domain, sid, nodes, [], pool.clients_os,
+                                                           fixed_generation, rng, executor)
+
+        print("Creating Domain Controllers")
+        state.dcs_props, state.ridcount = create_dcs(graph, domain, sid, state.dcou, state.ridcount,
+                                                     pool.servers_os, pool.ous, rng)
+
+    def users(graph):
+        print("Generating User Nodes")
+        state.users, state.ridcount = create_users(graph, domain, sid, nodes, domain_settings.current_time,
+                                                   pool.first_names, pool.last_names, [], state.ridcount, rng,
+                                                   executor)
+
+    def groups(graph):
+        print("Generating Group Nodes")
+        state.groups, state.dept_groups, state.ridcount = create_groups(graph, domain, sid, nodes, [],
+                                                                        state.ridcount, pool.groups,
+                                                                        fixed_generation, rng, executor)
+
+    def domain_admins(graph):
+        print("Adding Domain Admins to Local Admins of Computers")
+        add_domain_admin_to_local_admin(graph, sid, state.computers + [dc["name"] for dc in state.dcs_props])
+
+        state.das = add_domain_admins(graph, domain, nodes, state.users, rng)
+
+    def nested_groups(graph):
+        print("Applying random group nesting")
+        create_nested_groups(graph, nodes, state.dept_groups, rng)
+
+    def users_to_group(graph):
+        print("Adding users to groups")
+        state.it_users = add_users_to_group(graph, nodes, state.users, state.dept_groups, state.das, pool.groups,
+                                            rng)
+
+    def local_admin_rights(graph):
+        print("Adding local admin rights")
+        state.it_groups = add_local_admin_rights(graph, state.dept_groups, state.computers, rng)
+
+    def rdp_dcom_delegate(graph):
+        print("Adding RDP/ExecuteDCOM/AllowedToDelegateTo")
+        add_rdp_dcom_delegate(graph, state.computers, state.it_users, state.it_groups, rng)
+
+    def sessions(graph):
+        print("Adding sessions")
+        add_sessions(graph, nodes, state.computers, state.users, state.das, rng)
+
+    def domain_admin_aces(graph):
+        print("Adding Domain Admin ACEs")
+        add_domain_admin_aces(graph, domain, state.computers, state.users, state.groups)
+
+    def ous_gpos(graph):
+        print("Creating OUs")
+        ou_props, ou_guid_map = create_computers_ous(graph, domain, state.computers, {}, [], nodes, pool.ous, rng)
+        ou_props, ou_guid_map = create_users_ous(graph, domain, state.users, ou_guid_map, ou_props, nodes,
+                                                 pool.ous, rng)
+        link_ous_to_domain(graph, domain, ou_guid_map)
+
+        print("Creating GPOs")
+        state.gpos = create_gpos(graph, domain, [], rng)
+        link_to_ous(graph, state.gpos, domain, ou_guid_map, rng)
+
+    def outbound_acls(graph):
+        add_outbound_acls(graph, state.it_groups, state.it_users, state.gpos, state.computers, pool.acls,
+                          fixed_generation, rng)
+
+    def user_computer_properties(graph):
+        print("Marking some users as Kerberoastable")
+        add_kerberoastable_users(graph, state.it_users, rng)
+
+        print("Adding unconstrained delegation to a few computers")
+        add_unconstrained_delegation(graph, state.computers, rng)
+
+    return [
+        ("data_generation", standard_nodes),
+        ("create_computers", computers),
+        ("create_users", users),
+        ("create_groups", groups),
+        ("add_domain_admins", domain_admins),
+        ("create_nested_groups", nested_groups),
+        ("add_users_to_group", users_to_group),
+        ("add_local_admin_rights", local_admin_rights),
+        ("add_rdp_dcom_delegate", rdp_dcom_delegate),
+        ("add_sessions", sessions),
+        ("add_domain_admin_aces", domain_admin_aces),
+        ("create_ous_gpos", ous_gpos),
+        ("add_outbound_acls", outbound_acls),
+        ("add_user_computer_properties", user_computer_properties)
+    ]
+
+
+@gc_paused()
+def generate_domain(domain_settings, pool, graph=None):
+    """
+    Generates the nodes and the relationships of a domain, running
+    the stages listed by domain_stages one after the other.
 
-    print("Adding unconstrained delegation to a few computers")
-    add_unconstrained_delegation(session, computers)
+    Arguments:
+        domain_settings -- the entity containing nodes, domain,
+                           current_time and sid of the domain to generate
+        pool            -- the entity containing a pool of values
+                           used to create nodes inside the domain,
+                           i.e., a list of first names and last names,
+                           a list of client OS and server OS, a list
+                           of acls, groups, and ous
+        graph           -- the domain graph the domain is added to;
+                           if None, a new graph is created
 
-    session.run("MATCH (n:User) SET n.owned=false")
-    session.run("MATCH (n:Computer) SET n.owned=false")
-    session.run("MATCH (n) SET n.domain=$domain", domain=domain_settings.domain)
+    Returns:
+        graph -- the generated domain graph
+    """
+    if graph is None:
+        graph = DomainGraph()
 
-    session.close()
+    # The name pools are sent once to each process, not with every shard of users
+    with shard_executor(domain_settings.processes, set_name_pools, (pool.first_names, pool.last_names)) as executor:
+        for name, stage in domain_stages(domain_settings, pool, executor):
+            stage(graph)
 
-    print("Database Generation Finished!")
+    return graph
@@ -1,6 +1,7 @@
+import functools
 import time
 import os
-from adgen.utils.loader import get_list_from_pkl, get_list_from_ini
+from adgen.utils.loader import LazyPool, get_list_from_pkl, get_list_from_ini
 
 default_path = os.path.join(os.path.abspath('adgen'), 'data', 'default_config.ini')
 
@@ -9,22 +10,34 @@ DEFAULT_DB_SETTINGS = {
     'username': 'neo4j',
     'password': 'neo4jpwd',
     'driver': None,
-    'connected': False
+    'connected': False,
+    'defer_schema': False,
+    'recreate_db': False,
+    'batch_size': 500,
+    'transactions': False,
+    'workers': 1,
+    'async_mode': False
 }
 
 DEFAULT_DOMAIN_SETTINGS = {
     'nodes': 600,
     'domain': 'TESTLAB.LOCAL',
     'current_time': int(time.time()),
-    'sid': 'S-1-5-21-883232822-274137685-4173207997'
+    'sid': 'S-1-5-21-883232822-274137685-4173207997',
+    'processes': 1,
+    'domains': 1,
+    # The time the timestamps of a seeded domain are relative to (2021-01-01),
+    # so that the same seed generates the same domain at any time
+    'seed_time': 1609459200
 }
 
-DEFAULT_POOL = {
-    'first_names': get_list_from_pkl("first.pkl"),
-    'last_names': get_list_from_pkl("last.pkl"),
-    'clients_os': get_list_from_ini("CLIENTS", default_path),
-    'servers_os': get_list_from_ini("SERVERS", default_path),
-    'acls': get_list_from_ini("ACLS", default_path),
-    'groups': get_list_from_ini("GROUPS", default_path),
-    'ous': get_list_from_ini("OUS", default_path)
-}
+# Each list is only loaded the first time it is used
+DEFAULT_POOL = LazyPool({
+    'first_names': functools.partial(get_list_from_pkl, "first.pkl"),
+    'last_names': functools.partial(get_list_from_pkl, "last.pkl"),
+    'clients_os': functools.partial(get_list_from_ini, "CLIENTS", default_path),
+    'servers_os': functools.partial(get_list_from_ini, "SERVERS", default_path),
+    'acls': functools.partial(get_list_from_ini, "ACLS", default_path),
+    'groups': functools.partial(get_list_from_ini, "GROUPS", default_path),
+    'ous': functools.partial(get_list_from_ini, "OUS", default_path)
+})
@@ -5,3 +5,9 @@ class DbSettings:
         self.password = None
         self.driver = None
         self.connected = None
+        self.defer_schema = None
+        self.recreate_db = None
+        self.batch_size = None
+        self.transactions = None
+        self.workers = None
+        self.async_mode = None
@@ -0,0 +1,324 @@
+import itertools
+
+from array import array
+
+
+class EdgeTable:
+    """
+    The relationships of a type, kept as two arrays holding the dense
+    ids of their start and end nodes. Relationships added together
+    share their properties, which are stored once for each run of
+    them. Iterating over the table yields (start objectid, end
+    objectid, properties) tuples.
+    """
+
+    def __init__(self, objectids):
+        """
+        Arguments:
+            objectids -- the list mapping each dense id to its objectid
+        """
+        self.objectids = objectids
+        self.starts = array("I")
+        self.ends = array("I")
+        self.runs = []
+
+    def extend(self, pairs, props):
+        """
+        Adds some relationships with the same properties.
+
+        Arguments:
+            pairs -- a list of (start id, end id) tuples
+            props -- the properties of the relationships
+        """
+        self.starts.extend([a for a, b in pairs])
+        self.ends.extend([b for a, b in pairs])
+
+        if self.runs and self.runs[-1][1] is props:
+            self.runs[-1] = (len(self.starts), props)
+        else:
+            self.runs.append((len(self.starts), props))
+
+    def ids(self):
+        """
+        Returns:
+            A generator of (start id, end id, properties) tuples
+        """
+        first = 0
+        for last, props in self.runs:
+            yield from zip(self.starts[first:last], self.ends[first:last], itertools.repeat(props))
+            first = last
+
+    def unique(self):
+        """
+        Collapses the relationships between the same nodes, as a MERGE
+        would do. Each relationship is keyed by the ids of its nodes,
+        packed into a single 64-bit integer, so that no tuple is built
+        for each of them.
+
+        Returns:
+            A dictionary mapping the packed ids of the start and end
+            nodes of each relationship to its properties
+        """
+        edges = {}
+        first = 0
+        for last, props in self.runs:
+            run = dict.fromkeys([a << 32 | b for a, b in zip(self.starts[first:last], self.ends[first:last])], props)
+            # The properties of a relationship already added with
+            # different ones are merged, as SET r += would do
+            for key in [key for key in run if key in edges]:
+                if edges[key] is not props:
+                    run[key] = {**edges[key], **props}
+            edges.update(run)
+            first = last
+        return edges
+
+    def __iter__(self):
+        objectids = self.objectids
+        for a, b, props in self.ids():
+            yield objectids[a], objectids[b], props
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class DomainGraph:
+    """
+    In-memory model of a generated domain. Each node is given a dense
+    integer id when it is added, and its objectid and label are stored
+    once, in lists indexed by that id; relationships are kept in one
+    EdgeTable for each type, between the ids of their nodes. Nodes
+    are kept in one table for each label, keyed by objectid. Writers
+    consume the graph once it is complete.
+
+    The generators look each node up once, by objectid or by label and
+    name (e.g., the DOMAIN CONTROLLERS group and OU share their name),
+    with resolve() or resolve_all(), and then add the relationships between
+    the ids with add_edges(), without building a row for each of them.
+
+    A listener can follow the graph while it is generated: its nodes()
+    method receives the objectid and the new properties of the nodes
+    added or updated, and its edges() method the relationships added.
+    A graph streamed to a listener does not need to retain the
+    properties and the relationships: only the objectids, labels and
+    names used to resolve the relationships are then kept in memory.
+
+    Properties shared by many nodes (e.g., their domain) can be stamped
+    on the nodes when they are added, so that they are written together
+    with the other properties instead of by a later pass over the nodes.
+    """
+
+    def __init__(self, listener=None, retain=True):
+        """
+        Arguments:
+            listener -- an object notified of every change (optional)
+            retain   -- if False, the properties of the nodes and the
+                        relationships are only passed to the listener
+        """
+        self.nodes = {}
+        self.ids = {}
+        self.objectids = []
+        self.labels = []
+        self.names = {}
+        self.edges = {}
+        self.edge_count = 0
+        self.listener = listener
+        self.retain = retain
+        self.stamps = {}
+        self.duplicates = {}
+
+    def merge_nodes(self, label, rows):
+        """
+        Adds (or updates) nodes with the given label.
+
+        Arguments:
+            label -- the label of the nodes (e.g., User, Computer, ...)
+            rows  -- a list of dictionaries, each containing the objectid
+                     of a node ('id') and its properties ('props')
+        """
+        table = self.nodes.setdefault(label, {})
+        stamp = {**self.stamps.get(None, {}), **self.stamps.get(label, {})}
+        changes = []
+
+        for row in rows:
+            objectid = row["id"]
+            props = row["props"]
+            node_id = self.ids.get(objectid)
+            if node_id is None:
+                node_id = len(self.objectids)
+                self.ids[objectid] = node_id
+                self.objectids.append(objectid)
+                self.labels.append(label)
+                if stamp:
+                    props = {**stamp, **props}
+            else:
+                self.labels[node_id] = label
+
+            if self.retain:
+                node = table.setdefault(objectid, {})
+                node.update(props)
+            else:
+                node = props
+
+            if "name" in node:
+                self.names[label, node["name"]] = node_id
+
+            if self.listener is not None:
+                changes.append({"id": objectid, "props": dict(props)})
+
+        if self.listener is not None:
+            self.listener.nodes(label, changes)
+
+    def stamp(self, label, props):
+        """
+        Sets some properties on every node with the given label which
+        is added from now on. The properties given when adding a node
+        take precedence over the stamped ones.
+
+        Arguments:
+            label -- the label of the nodes; if None, every node is stamped
+            props -- the properties to set
+        """
+        self.stamps[label] = dict(props)
+
+    def merge_edges(self, rel_type, start, end, rows, props=None):
+        """
+        Adds relationships of the given type.
+
+        Arguments:
+            rel_type -- the type of the relationships (e.g., MemberOf, ...)
+            start    -- a (label, key) tuple identifying the start nodes
+            end      -- a (label, key) tuple identifying the end nodes
+            rows     -- a list of dictionaries, each containing the key of
+                        the start node ('a') and of the end node ('b')
+            props    -- the properties to set on each relationship
+        """
+        self.add_edges(rel_type, [(self.resolve(start, row["a"]), self.resolve(end, row["b"])) for row in rows], props)
+
+    def add_edges(self, rel_type, pairs, props=None):
+        """
+        Adds relationships of the given type between nodes whose
+        ids are already known, without looking them up.
+
+        Arguments:
+            rel_type -- the type of the relationships (e.g., HasSession, ...)
+            pairs    -- a list of (start id, end id) tuples
+            props    -- the properties to set on each relationship
+        """
+        props = props or {}
+        self.edge_count += len(pairs)
+
+        if self.retain:
+            table = self.edges.get(rel_type)
+            if table is None:
+                table = self.edges[rel_type] = EdgeTable(self.objectids)
+            table.extend(pairs, props)
+
+        if self.listener is not None:
+            objectids = self.objectids
+            self.listener.edges(rel_type, [{"a": objectids[a], "b": objectids[b], "props": props}
+                                           for a, b in pairs])
+
+    def set_properties(self, label, key, values, props):
+        """
+        Sets some properties on the nodes identified by the given values.
+
+        Arguments:
+            label  -- the label of the nodes
+            key    -- the property used to identify the nodes
+            values -- a list of values of the identifying property
+            props  -- the properties to set
+        """
+        updated = {}
+
+        for node_id in self.resolve_all((label, key), values):
+            objectid = self.objectids[node_id]
+            node_label = self.labels[node_id]
+            if self.retain:
+                self.nodes[node_label][objectid].update(props)
+            updated.setdefault(node_label, []).append({"id": objectid, "props": props})
+
+        if self.listener is not None:
+            for node_label, rows in updated.items():
+                self.listener.nodes(node_label, rows)
+
+    def resolve(self, endpoint, value):
+        """
+        Finds the id of the node identified by an endpoint.
+
+        Arguments:
+            endpoint -- a (label, key) tuple identifying the node
+            value    -- the value of the key
+
+        Returns:
+            The dense id of the node
+        """
+        label, key = endpoint
+
+        if key == "objectid":
+            node_id = self.ids.get(value)
+        else:
+            node_id = self.names.get((label, value))
+
+        if node_id is None:
+            raise Exception(f"ERROR: Domain graph: no {label or 'node'} with {key} {value}")
+        return node_id
+
+    def resolve_all(self, endpoint, values):
+        """
+        Finds the ids of the nodes identified by some values of
+        the same endpoint.
+
+        Arguments:
+            endpoint -- a (label, key) tuple identifying the nodes
+            values   -- a list containing the values of the key
+
+        Returns:
+            A list containing the dense ids of the nodes, in the same order
+        """
+        label, key = endpoint
+        try:
+            if key == "objectid":
+                ids = self.ids
+                return [ids[value] for value in values]
+            names = self.names
+            return [names[label, value] for value in values]
+        except KeyError:
+            # Raises the error of the first missing node
+            return [self.resolve(endpoint, value) for value in values]
+
+    def unique_edges(self, rel_type):
+        """
+        Collapses the relationships of a type between the same nodes,
+        as a MERGE would do, so that the writers never send the same
+        relationship twice. The number of relationships dropped is
+        recorded in duplicates, by type.
+
+        Arguments:
+            rel_type -- the type of the relationships
+
+        Returns:
+            A generator of (start objectid, end objectid, properties)
+            tuples, one for each pair of nodes
+        """
+        table = self.edges.get(rel_type)
+        if table is None:
+            return
+
+        packed = table.unique()
+        self.duplicates[rel_type] = len(table) - len(packed)
+
+        objectids = self.objectids
+        for key, props in packed.items():
+            yield objectids[key >> 32], objectids[key & 0xFFFFFFFF], props
+
+    def count_nodes(self):
+        """Returns the number of nodes in the graph."""
+        return len(self.objectids)
+
+    def count_edges(self):
+        """Returns the number of relationships in the graph."""
+        return self.edge_count
+
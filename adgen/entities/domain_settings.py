@@ -4,3 +4,7 @@ class DomainSettings:
         self.domain = None
         self.current_time = None
         self.sid = None
+        self.seed = None
+        self.processes = None
+        self.domains = None
+        self.distribution = None
@@ -0,0 +1,62 @@
+import bisect
+import itertools
+import random
+
+
+class WeightedList:
+    """
+    A list of options, each one with a weight (e.g., the percentage of
+    the computers running an operating system). Options are drawn with
+    a probability proportional to their weight, through the cumulative
+    weights, so each option is stored once whatever its weight, and
+    weights can be fractional. Iterating over the list yields each
+    option once.
+    """
+
+    def __init__(self, options, weights):
+        """
+        Arguments:
+            options -- a list containing the options
+            weights -- a list containing the weight of each option
+        """
+        if len(options) != len(weights):
+            raise Exception("ERROR: each option must have a weight.")
+
+        self.options = list(options)
+        self.weights = list(weights)
+        self.cum_weights = list(itertools.accumulate(self.weights))
+
+    def choice(self, rng=random):
+        """
+        Draws an option.
+
+        Arguments:
+            rng -- the random number generator the option is drawn from
+
+        Returns:
+            The option drawn
+        """
+        total = self.cum_weights[-1]
+        return self.options[bisect.bisect(self.cum_weights, rng.random() * total, 0, len(self.options) - 1)]
+
+    def sample(self, count, rng=random):
+        """
+        Draws some options at once, with replacement.
+
+        Arguments:
+            count -- the number of options to draw
+            rng   -- the random number generator the options are drawn from
+
+        Returns:
+            A list containing the options drawn
+        """
+        return rng.choices(self.options, cum_weights=self.cum_weights, k=count)
+
+    def __getitem__(self, index):
+        return self.options[index]
+
+    def __iter__(self):
+        return iter(self.options)
+
+    def __len__(self):
+        return len(self.options)
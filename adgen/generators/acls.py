@@ -2,273 +2,79 @@ import random
 import math
 
 from adgen.generators.gpos import link_default_gpos
-from adgen.utils.support_functions import cs, get_fixed_generation
+from adgen.utils.support_functions import allocate_quotas, assign_quotas, cn, cs
 
 
-def create_enterprise_admins(session, domain_name):
-    """
-    Creates enterprise administrators.
+# The ACEs the well-known groups have on the domain
+DOMAIN_ACES = [
+    ("ENTERPRISE ADMINS", ["GenericAll"]),
+    ("ADMINISTRATORS", ["Owns", "WriteOwner", "WriteDacl", "DCSync", "GetChanges", "GetChangesAll"]),
+    ("DOMAIN ADMINS", ["WriteOwner", "WriteDacl", "DCSync", "GetChanges", "GetChangesAll"]),
+    ("ENTERPRISE DOMAIN CONTROLLERS", ["GetChanges"]),
+    ("ENTERPRISE READ-ONLY DOMAIN CONTROLLERS", ["GetChanges"]),
+    ("DOMAIN CONTROLLERS", ["GetChangesAll"])
+]
 
-    Arguments:
-        session     -- the current session
-        domain_name -- the domain name
-    """
-    group_name = "ENTERPRISE ADMINS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        MERGE (m:Group {name:$gname})
-        MERGE (m)-[:GenericAll {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-
-def create_administrators(session, domain_name):
-    """
-    Creates administrators.
 
-    Arguments:
-        session     -- the current session
-        domain_name -- the domain name
+def add_domain_aces(graph, domain_name):
     """
-    group_name = "ADMINISTRATORS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        MERGE (m:Group {name:$gname})
-        MERGE (m)-[:Owns {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:WriteOwner {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:WriteDacl {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:DCSync {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChanges {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChangesAll {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-
-def create_domain_admins(session, domain_name):
-    """
-    Creates domain administrators.
+    Gives the well-known groups the ACEs listed in DOMAIN_ACES
+    on the domain, adding the edges of each ACE at once.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
     """
-    group_name = "DOMAIN ADMINS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:WriteOwner {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:WriteDacl {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:DCSync {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChanges {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name)
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChangesAll {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-
-def create_enterprise_dcs(session, domain_name):
-    """
-    Creates enterprise controllers.
+    props = {}
+    for group, aces in DOMAIN_ACES:
+        for ace in aces:
+            props.setdefault(ace, []).append({'a': cn(group, domain_name), 'b': domain_name})
 
-    Arguments:
-        session     -- the current session
-        domain_name -- the domain name
-    """
-    group_name = "ENTERPRISE DOMAIN CONTROLLERS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChanges {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    group_name = "ENTERPRISE READ-ONLY DOMAIN CONTROLLERS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChanges {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-    group_name = "DOMAIN CONTROLLERS@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (m)-[:GetChangesAll {isacl:true}]->(n)
-        """,
-        domain=domain_name,
-        gname=group_name
-    )
-
-
-def add_standard_edges(session, domain_name, dcou):
-    link_default_gpos(session, domain_name, dcou)
-    create_enterprise_admins(session, domain_name)
-    create_administrators(session, domain_name)
-    create_domain_admins(session, domain_name)
-    create_enterprise_dcs(session, domain_name)
-
-
-def add_domain_admin_to_local_admin(session, domain_sid):
+    for ace, ace_props in props.items():
+        graph.merge_edges(ace, ("Group", "name"), ("Domain", "name"), ace_props, {"isacl": True})
+
+
+def add_standard_edges(graph, domain_name, dcou):
+    link_default_gpos(graph, domain_name, dcou)
+    add_domain_aces(graph, domain_name)
+
+
+def add_domain_admin_to_local_admin(graph, domain_sid, computers):
     """
     Adds domain administrator to local administrators.
 
     Arguments:
-        session    -- the current session
+        graph      -- the domain graph the generated entities are added to
         domain_sid -- the domain sid
+        computers  -- a list containing the various computers,
+                      domain controllers included
     """
-    session.run(
-        """
-        MATCH (n:Computer)
-        MATCH (m:Group {objectid: $id})
-        MERGE (m)-[:AdminTo]->(n)
-        """,
-        id=cs(512, domain_sid)
-    )
+    group_id = graph.resolve(("Group", "objectid"), cs(512, domain_sid))
+    graph.add_edges("AdminTo", [(group_id, x) for x in graph.resolve_all(("Computer", "name"), computers)])
 
 
-def add_local_admin_rights(session, groups, computers):
+def add_local_admin_rights(graph, dept_groups, computers, rng=random):
     """
     Adds local admin rights.
 
     Arguments:
-        session   -- the current session
-        groups    -- a list containing the various groups
-        computers -- a list containing the various computers
+        graph       -- the domain graph the generated entities are added to
+        dept_groups -- a dictionary mapping each department to its groups
+        computers   -- a list containing the various computers
+        rng         -- the random number generator the values are drawn from
 
     Returns:
         it_groups -- a list of it groups
     """
-    it_groups = [x for x in groups if "IT" in x]
-    random.shuffle(it_groups)
+    it_groups = list(dept_groups.get("IT", []))
+    rng.shuffle(it_groups)
 
     if len(it_groups) < 4:
         max_lim = len(it_groups)
     else:
         max_lim = 4
 
-    super_groups = random.sample(it_groups, max_lim)
+    super_groups = rng.sample(it_groups, max_lim)
     super_group_num = int(math.floor(len(computers) * .85))
     it_groups = [x for x in it_groups if not x in super_groups]
     total_it_groups = len(it_groups)
@@ -278,244 +84,102 @@ def add_local_admin_rights(session, groups, computers):
     dist_d = int(math.ceil(total_it_groups * .03))
 
     distribution_list = [1] * dist_a + [2] * dist_b + [10] * dist_c + [50] * dist_d
+    computer_ids = graph.resolve_all(("Computer", "name"), computers)
 
-    props = []
+    pairs = []
     for x in range(0, total_it_groups):
-        g = it_groups[x]
+        g = graph.resolve(("Group", "name"), it_groups[x])
         dist = distribution_list[x]
 
-        to_add = random.sample(computers, dist)
+        to_add = rng.sample(computer_ids, dist)
         for a in to_add:
-            props.append({"a": g, "b": a})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props AS prop
-                MERGE (n:Group {name:prop.a})
-                WITH n,prop
-                MERGE (m:Computer {name:prop.b})
-                WITH n,m
-                MERGE (n)-[:AdminTo]->(m)
-                """,
-                props=props
-            )
-            props = []
-
-    for x in super_groups:
-        for a in random.sample(computers, super_group_num):
-            props.append({"a": x, "b": a})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props AS prop
-                MERGE (n:Group {name:prop.a})
-                WITH n,prop
-                MERGE (m:Computer {name:prop.b})
-                WITH n,m
-                MERGE (n)-[:AdminTo]->(m)
-                """,
-                props=props
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:Group {name:prop.a})
-        WITH n,prop
-        MERGE (m:Computer {name:prop.b})
-        WITH n,m
-        MERGE (n)-[:AdminTo]->(m)
-        """,
-        props=props
-    )
+            pairs.append((g, a))
+
+    for x in graph.resolve_all(("Group", "name"), super_groups):
+        for a in rng.sample(computer_ids, super_group_num):
+            pairs.append((x, a))
+
+    graph.add_edges("AdminTo", pairs)
     return it_groups
 
 
-def add_domain_admin_aces(session, domain_name, computers, users, groups):
+def add_domain_admin_aces(graph, domain_name, computers, users, groups):
     """
     Add domain admin ACEs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         computers   -- a list containing the various computers
         users       -- a list containing the various users
         groups      -- a list containing the various groups
     """
-    group_name = "DOMAIN ADMINS@{}".format(domain_name)
-    props = []
-    for x in computers:
-        props.append({'name': x})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MATCH (n:Computer {name:prop.name})
-                WITH n
-                MATCH (m:Group {name:$gname})
-                WITH m,n
-                MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-                """,
-                props=props,
-                gname=group_name
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props as prop
-        MATCH (n:Computer {name:prop.name})
-        WITH n
-        MATCH (m:Group {name:$gname})
-        WITH m,n
-        MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-        """,
-        props=props,
-        gname=group_name
-    )
-
-    for x in users:
-        props.append({'name': x})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MATCH (n:User {name:prop.name})
-                WITH n
-                MATCH (m:Group {name:$gname})
-                WITH m,n
-                MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-                """,
-                props=props,
-                gname=group_name
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props as prop
-        MATCH (n:User {name:prop.name})
-        WITH n
-        MATCH (m:Group {name:$gname})
-        WITH m,n
-        MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-        """,
-        props=props,
-        gname=group_name
-    )
-
-    for x in groups:
-        props.append({'name': x})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MATCH (n:Group {name:prop.name})
-                WITH n
-                MATCH (m:Group {name:$gname})
-                WITH m,n
-                MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-                """,
-                props=props,
-                gname=group_name
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props as prop
-        MATCH (n:Group {name:prop.name})
-        WITH n
-        MATCH (m:Group {name:$gname})
-        WITH m,n
-        MERGE (m)-[r:GenericAll {isacl:true}]->(n)
-        """,
-        props=props,
-        gname=group_name
-    )
-
-
-def add_outbound_acls(session, it_groups, it_users, gpos, computers, acl_list, fixed_generation):
+    group_id = graph.resolve(("Group", "name"), "DOMAIN ADMINS@{}".format(domain_name))
+
+    for label, names in (("Computer", computers), ("User", users), ("Group", groups)):
+        pairs = [(group_id, x) for x in graph.resolve_all((label, "name"), names)]
+        graph.add_edges("GenericAll", pairs, {"isacl": True})
+
+
+def add_outbound_acls(graph, it_groups, it_users, gpos, computers, acl_list, fixed_generation, rng=random):
     """
     Adds outbound ACLs.
 
     Arguments:
-        session   -- the current session
+        graph     -- the domain graph the generated entities are added to
         it_groups -- a list of it groups
         it_users  -- a list of it users
         gpos      -- a list containing the various GPOs
         computers -- a list containing the various computers
-        acl_list  -- a list of available ACLs
+        acl_list  -- a WeightedList of available ACLs
+        rng       -- the random number generator the values are drawn from
     """
     num_acl_principals = int(round(len(it_groups) * .1))
     print("Adding outbound ACLs to {} objects".format(num_acl_principals))
-    acl_groups = random.sample(it_groups, num_acl_principals)
+
+    # The principals and the targets are looked up once, and then
+    # drawn by id
+    it_groups = graph.resolve_all(("Group", "name"), it_groups)
+    it_users = graph.resolve_all(("User", "name"), it_users)
+    gpos = graph.resolve_all(("GPO", "name"), gpos)
+    computers = graph.resolve_all(("Computer", "name"), computers)
+
+    acl_groups = rng.sample(it_groups, num_acl_principals)
     all_principals = it_users + it_groups
 
-    fixed_list = get_fixed_generation(len(acl_groups) * 10, acl_list)
+    num_aces = len(acl_groups) * 10
+    if fixed_generation:
+        fixed_list = assign_quotas(acl_list.options, allocate_quotas(num_aces, acl_list), 0, num_aces)
+
+    # Edges are collected by ACE and added with one call per ACE type,
+    # instead of one call per ACE
+    edges = {}
 
     for i in acl_groups:
-        for j in range(len(fixed_list)):
+        for j in range(num_aces):
             if fixed_generation:
-                ace = fixed_list[j - 1]
+                ace = fixed_list[j]
             else:
-                ace = random.choice(acl_list)
+                ace = acl_list.choice(rng)
 
-            ace_string = '[r:' + ace + '{isacl:true}]'
             if ace == "GenericAll" or ace == "GenericWrite" or ace == "WriteOwner" or ace == "WriteDacl":
-                p = random.choice(all_principals)
-                p2 = random.choice(gpos)
-                session.run(
-                    """
-                    MERGE (n:Group {name:$group})
-                    MERGE (m {name:$principal})
-                    MERGE (n)-""" + ace_string + "->(m)",
-                    group=i,
-                    principal=p
-                )
-                session.run(
-                    """
-                    MERGE (n:Group {name:$group})
-                    MERGE (m:GPO {name:$principal})
-                    MERGE (n)-""" + ace_string + "->(m)",
-                    group=i,
-                    principal=p2
-                )
+                p = rng.choice(all_principals)
+                p2 = rng.choice(gpos)
+                edges.setdefault(ace, []).append((i, p))
+                edges.setdefault(ace, []).append((i, p2))
             elif ace == "AddMember":
-                p = random.choice(it_groups)
-                session.run(
-                    """
-                    MERGE (n:Group {name:$group})
-                    MERGE (m:Group {name:$principal})
-                    MERGE (n)-""" + ace_string + "->(m)",
-                    group=i,
-                    principal=p
-                )
+                p = rng.choice(it_groups)
+                edges.setdefault(ace, []).append((i, p))
             elif ace == "ReadLAPSPassword":
-                p = random.choice(all_principals)
-                targ = random.choice(computers)
-                session.run(
-                    """
-                    MERGE (n {name:$principal})
-                    MERGE (m:Computer {name:$target})
-                    MERGE (n)-[r:ReadLAPSPassword]->(m)
-                    """,
-                    target=targ,
-                    principal=p
-                )
+                p = rng.choice(all_principals)
+                targ = rng.choice(computers)
+                edges.setdefault(ace, []).append((p, targ))
             else:
-                p = random.choice(it_users)
-                session.run(
-                    """
-                    MERGE (n:Group {name:$group})
-                    MERGE (m:User {name:$principal})
-                    MERGE (n)-""" + ace_string + "->(m)",
-                    group=i,
-                    principal=p
-                )
+                p = rng.choice(it_users)
+                edges.setdefault(ace, []).append((i, p))
+
+    for ace, pairs in edges.items():
+        if ace == "ReadLAPSPassword":
+            graph.add_edges(ace, pairs)
+        else:
+            graph.add_edges(ace, pairs, {"isacl": True})
@@ -1,96 +1,152 @@
+import functools
 import math
 import random
 
-from adgen.utils.support_functions import cn, cs, get_fixed_generation
+from adgen.utils.support_functions import BATCH_SIZE, allocate_quotas, assign_quotas, cn, cs, map_shards, \
+     shard_rng, split_shards
 
 
-def create_computers(session, domain_name, domain_sid, num_nodes, computers, client_os_list, fixed_generation):
+def create_computers(graph, domain_name, domain_sid, num_nodes, computers, client_os_list, fixed_generation,
+                     rng=random, executor=None):
     """
-    Creates computer nodes.
+    Creates computer nodes, one batch at a time. The computers are
+    generated in shards, which can be generated by separate processes.
 
     Arguments:
-        session        -- the current session
+        graph          -- the domain graph the generated entities are added to
         domain_name    -- the domain name
         domain_sid     -- the domain sid
         num_nodes      -- the number of nodes
         computers      -- a list containing the various computers
-        client_os_list -- a list of available client operating systems
+        client_os_list -- a WeightedList of available client operating systems
+        rng            -- the random number generator the values are drawn from
+        executor       -- a process pool the shards are generated in (optional)
 
     Returns:
-        computer_props_list -- a list containing the properties of the various computers
-        computers           -- a list containing the various computers
-        ridcount            -- the new rid value
+        computers -- a list containing the various computers
+        ridcount  -- the new rid value
     """
-    computer_props_list = []
     group_name = "DOMAIN COMPUTERS@{}".format(domain_name)
-    props = []
     ridcount = 1000
 
-    fixed_list = get_fixed_generation(num_nodes, client_os_list)
+    # Only the number of computers of each operating system is passed
+    # to the shards, which assign the operating systems themselves
+    quotas = allocate_quotas(num_nodes, client_os_list) if fixed_generation else None
+    shards = [(offset, count, quotas) for offset, count in split_shards(num_nodes)]
+
+    generate = functools.partial(generate_computer_shard, domain_name, domain_sid, client_os_list, ridcount,
+                                 rng.getrandbits(64))
+
+    for batches in map_shards(generate, shards, executor):
+        for batch in batches:
+            merge_computers(graph, batch, group_name)
+            computers.extend(prop["props"]["name"] for prop in batch)
+
+    return computers, ridcount + num_nodes
+
+
+def generate_computer_shard(domain_name, domain_sid, client_os_list, ridcount, seed, shard):
+    """
+    Generates the properties of the computers of a shard.
+
+    Arguments:
+        domain_name    -- the domain name
+        domain_sid     -- the domain sid
+        client_os_list -- a WeightedList of available client operating systems
+        ridcount       -- the rid of the first computer of the domain
+        seed           -- the seed the generators of the shards are created from
+        shard          -- the (offset, count, quotas) tuple of the shard, where
+                          quotas are the numbers of computers of each operating
+                          system in a fixed generation, and None otherwise
+
+    Returns:
+        A list of batches, each containing the properties of some computers
+    """
+    offset, count, quotas = shard
+    fixed_list = None
+    if quotas is not None:
+        fixed_list = assign_quotas(client_os_list.options, quotas, offset, count)
+    return list(generate_computers(domain_name, domain_sid, count, client_os_list, fixed_list, ridcount + offset,
+                                   rng=shard_rng(seed, offset), first=offset + 1))
+
 
-    for i in range(1, num_nodes + 1):
+def generate_computers(domain_name, domain_sid, num_nodes, client_os_list, fixed_list, ridcount,
+                       batch_size=BATCH_SIZE, rng=random, first=1):
+    """
+    Generates the properties of the computers, one batch at a time,
+    so that only a batch is kept in memory.
+
+    Arguments:
+        domain_name      -- the domain name
+        domain_sid       -- the domain sid
+        num_nodes        -- the number of nodes
+        client_os_list   -- a WeightedList of available client operating systems
+        fixed_list       -- the operating systems of the computers, if they
+                            follow exactly the frequencies of client_os_list
+                            (see allocate_quotas); None otherwise
+        ridcount         -- the rid of the first computer
+        batch_size       -- the number of computers of each batch
+        rng              -- the random number generator the values are drawn from
+        first            -- the number of the first computer, used in its name
+
+    Returns:
+        A generator of lists, each containing the properties of
+        at most batch_size computers
+    """
+    props = []
+    if fixed_list is None:
+        fixed_list = client_os_list.sample(num_nodes, rng)
+
+    for i in range(first, first + num_nodes):
         comp_name = "COMP{:05d}.{}".format(i, domain_name)
-        computers.append(comp_name)
-        if fixed_generation:
-            os = fixed_list[i - 1]
-        else:
-            os = random.choice(client_os_list)
+        os = fixed_list[i - first]
         enabled = True
-        computer_props = {
+        props.append({
             "id": cs(ridcount, domain_sid),
             "props": {
                 "name": comp_name,
                 "operatingsystem": os,
                 "enabled": enabled
             }
-        }
-        props.append(computer_props)
-        computer_props_list.append(computer_props)
+        })
         ridcount += 1
 
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MERGE (n:Base {objectid: prop.id})
-                SET n:Computer, n += prop.props
-                WITH n
-                MERGE (m:Group {name:$gname})
-                WITH n,m
-                MERGE (n)-[:MemberOf]->(m)
-                """,
-                props=props,
-                gname=group_name
-            )
+        if len(props) == batch_size:
+            yield props
             props = []
-    session.run(
-        """
-        UNWIND $props as prop
-        MERGE (n:Base {objectid:prop.id})
-        SET n:Computer, n += prop.props
-        WITH n
-        MERGE (m:Group {name:$gname})
-        WITH n,m
-        MERGE (n)-[:MemberOf]->(m)
-        """,
-        props=props,
-        gname=group_name
-    )
-    return computer_props_list, computers, ridcount
-
-
-def create_dcs(session, domain_name, domain_sid, dcou, ridcount, server_os_list, ous_list):
+
+    if props:
+        yield props
+
+
+def merge_computers(graph, props, group_name):
+    """
+    Adds some computers and makes them members of a group.
+
+    Arguments:
+        graph      -- the domain graph the generated entities are added to
+        props      -- a list containing the properties of the computers
+        group_name -- the name of the group the computers are members of
+    """
+    graph.merge_nodes("Computer", props)
+    group_id = graph.resolve(("Group", "name"), group_name)
+    ids = graph.resolve_all(("Computer", "objectid"), [prop['id'] for prop in props])
+    graph.add_edges("MemberOf", [(node_id, group_id) for node_id in ids])
+
+
+def create_dcs(graph, domain_name, domain_sid, dcou, ridcount, server_os_list, ous_list, rng=random):
     """
     Creates the domain controllers.
 
     Arguments:
-        session        -- the current session
+        graph          -- the domain graph the generated entities are added to
         domain_name    -- the domain name
         domain_sid     -- the domain sid
         dcou           -- the domain controller OU
         ridcount       -- the current rid value
-        server_os_list -- a list of available client operating systems
+        server_os_list -- a WeightedList of available server operating systems
         ous_list       -- a list of available OUs
+        rng            -- the random number generator the values are drawn from
 
     Returns:
         dc_props_list -- a list containing the properties of the domain controllers
@@ -102,7 +158,7 @@ def create_dcs(session, domain_name, domain_sid, dcou, ridcount, server_os_list,
         comp_name = cn(f"{ou}LABDC", domain_name)
         group_name = cn("DOMAIN CONTROLLERS", domain_name)
         sid = cs(ridcount, domain_sid)
-        os = random.choice(server_os_list)
+        os = server_os_list.choice(rng)
         enabled = True
 
         dc_props = {
@@ -114,311 +170,221 @@ def create_dcs(session, domain_name, domain_sid, dcou, ridcount, server_os_list,
         ridcount += 1
         dc_props_list.append(dc_props)
 
-        session.run(
-            """
-            MERGE (n:Base {objectid:$sid})
-            SET n:Computer,n.name=$name, n.operatingsystem=$os, n.enabled=$enabled
-            WITH n
-            MATCH (m:Group {name:$gname})
-            WITH n,m
-            MERGE (n)-[:MemberOf]->(m)
-            """,
-            sid=sid,
-            name=comp_name,
-            gname=group_name,
-            os=dc_props["operatingsystem"],
-            enabled=dc_props["enabled"]
-        )
-
-        session.run(
-            """
-            MATCH (n:Computer {objectid:$sid})
-            WITH n 
-            MATCH (m:OU {objectid:$dcou})
-            WITH n,m
-            MERGE (m)-[:Contains]->(n)
-            """,
-            sid=sid,
-            dcou=dcou
-        )
-
-        session.run(
-            """
-            MATCH (n:Computer {objectid:$sid})
-            WITH n
-            MATCH (m:Group {name:$gname})
-            WITH n,m
-            MERGE (n)-[:MemberOf]->(m)
-            """,
-            sid=sid,
-            gname=cn("ENTERPRISE DOMAIN CONTROLLERS", domain_name)
-        )
-
-        session.run(
-            """
-            MERGE (n:Computer {objectid:$sid})
-            WITH n
-            MERGE (m:Group {name:$gname})
-            WITH n,m
-            MERGE (m)-[:AdminTo]->(n)
-            """,
-            sid=sid,
-            gname=cn("DOMAIN ADMINS", domain_name)
-        )
+        graph.merge_nodes("Computer", [{
+            "id": sid,
+            "props": {
+                "name": comp_name,
+                "operatingsystem": os,
+                "enabled": enabled
+            }
+        }])
+        graph.merge_edges("MemberOf", ("Computer", "objectid"), ("Group", "name"), [{'a': sid, 'b': group_name}])
+        graph.merge_edges("Contains", ("OU", "objectid"), ("Computer", "objectid"), [{'a': dcou, 'b': sid}])
+        graph.merge_edges("MemberOf", ("Computer", "objectid"), ("Group", "name"),
+                           [{'a': sid, 'b': cn("ENTERPRISE DOMAIN CONTROLLERS", domain_name)}])
+        graph.merge_edges("AdminTo", ("Group", "name"), ("Computer", "objectid"),
+                           [{'a': cn("DOMAIN ADMINS", domain_name), 'b': sid}])
     return dc_props_list, ridcount
 
 
-def add_rdp_users(session, computers, it_users, count):
+def add_rdp_users(graph, computers, it_users, count, rng=random):
     """"
     Add RDP to users.
 
     Arguments:
-        session   -- the current session
-        computers -- a list containing the various computers
-        it_users  -- a list of it users
+        graph     -- the domain graph the generated entities are added to
+        computers -- a list containing the ids of the various computers
+        it_users  -- a list containing the ids of the it users
         count     -- an int value used for the iterations
+        rng       -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
-        comp = random.choice(computers)
-        user = random.choice(it_users)
-        props.append({'a': user, 'b': comp})
-
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:User {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:CanRDP]->(m)
-        """,
-        props=props
-    )
-
-
-def add_rdp_groups(session, computers, it_groups, count):
+        comp = rng.choice(computers)
+        user = rng.choice(it_users)
+        pairs.append((user, comp))
+
+    graph.add_edges("CanRDP", pairs)
+
+
+def add_rdp_groups(graph, computers, it_groups, count, rng=random):
     """"
     Add RDP to groups.
 
     Arguments:
-        session    -- the current session
-        computers  -- a list containing the various computers
-        it_groups  -- a list of it groups
+        graph      -- the domain graph the generated entities are added to
+        computers  -- a list containing the ids of the various computers
+        it_groups  -- a list containing the ids of the it groups
         count      -- an int value used for the iterations
+        rng        -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
         try:
-            comp = random.choice(computers)
-            user = random.choice(it_groups)
-            props.append({'a': user, 'b': comp})
+            comp = rng.choice(computers)
+            user = rng.choice(it_groups)
+            pairs.append((user, comp))
         except IndexError:
             pass
 
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:Group {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:CanRDP]->(m)
-        """,
-        props=props
-    )
+    graph.add_edges("CanRDP", pairs)
 
 
-def add_execute_dcom_users(session, computers, it_users, count):
+def add_execute_dcom_users(graph, computers, it_users, count, rng=random):
     """
     Adds execute DCOM to users.
 
     Arguments:
-        session   -- the current session
-        computers -- a list containing the various computers
-        it_users  -- a list of it users
+        graph     -- the domain graph the generated entities are added to
+        computers -- a list containing the ids of the various computers
+        it_users  -- a list containing the ids of the it users
         count     -- an int value used for the iterations
+        rng       -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
-        comp = random.choice(computers)
-        user = random.choice(it_users)
-        props.append({'a': user, 'b': comp})
-
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:User {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:ExecuteDCOM]->(m)
-        """,
-        props=props
-    )
-
-
-def add_execute_dcom_groups(session, computers, it_groups, count):
+        comp = rng.choice(computers)
+        user = rng.choice(it_users)
+        pairs.append((user, comp))
+
+    graph.add_edges("ExecuteDCOM", pairs)
+
+
+def add_execute_dcom_groups(graph, computers, it_groups, count, rng=random):
     """
     Adds execute DCOM to groups.
 
     Arguments:
-        session   -- the current session
-        computers -- a list containing the various computers
-        it_groups -- a list of it groups
+        graph     -- the domain graph the generated entities are added to
+        computers -- a list containing the ids of the various computers
+        it_groups -- a list containing the ids of the it groups
         count     -- an int value used for the iterations
+        rng       -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
         try:
-            comp = random.choice(computers)
-            user = random.choice(it_groups)
-            props.append({'a': user, 'b': comp})
+            comp = rng.choice(computers)
+            user = rng.choice(it_groups)
+            pairs.append((user, comp))
         except IndexError:
             pass
 
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:Group {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:ExecuteDCOM]->(m)
-        """,
-        props=props
-    )
+    graph.add_edges("ExecuteDCOM", pairs)
 
 
-def add_allowed_to_delegate_to_users(session, computers, it_users, count):
+def add_allowed_to_delegate_to_users(graph, computers, it_users, count, rng=random):
     """
     Adds allowed to delegate to users.
 
     Arguments:
-        session   -- the current session
-        computers -- a list containing the various computers
-        it_users  -- a list of it users
+        graph     -- the domain graph the generated entities are added to
+        computers -- a list containing the ids of the various computers
+        it_users  -- a list containing the ids of the it users
         count     -- an int value used for the iterations
+        rng       -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
         try:
-            comp = random.choice(computers)
-            user = random.choice(it_users)
-            props.append({'a': user, 'b': comp})
+            comp = rng.choice(computers)
+            user = rng.choice(it_users)
+            pairs.append((user, comp))
         except IndexError:
             pass
 
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:User {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:AllowedToDelegate]->(m)
-        """,
-        props=props
-    )
+    graph.add_edges("AllowedToDelegate", pairs)
 
 
-def add_allowed_to_delegate_to_computers(session, computers, count):
+def add_allowed_to_delegate_to_computers(graph, computers, count, rng=random):
     """
     Adds allowed to delegate to computers.
 
     Arguments:
-        session   -- the current session
-        computers -- a list containing the various computers
+        graph     -- the domain graph the generated entities are added to
+        computers -- a list containing the ids of the various computers
         count     -- an int value used for the iterations
+        rng       -- the random number generator the values are drawn from
     """
-    props = []
+    pairs = []
     for i in range(0, count):
         try:
-            comp = random.choice(computers)
-            user = random.choice(computers)
+            comp = rng.choice(computers)
+            user = rng.choice(computers)
             if comp == user:
                 continue
-            props.append({'a': user, 'b': comp})
+            pairs.append((user, comp))
         except IndexError:
             pass
 
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:Computer {name: prop.a})
-        MERGE (m:Computer {name: prop.b})
-        MERGE (n)-[r:AllowedToDelegate]->(m)
-        """,
-        props=props
-    )
+    graph.add_edges("AllowedToDelegate", pairs)
 
 
-def add_rdp_dcom_delegate(session, computers, it_users, it_groups):
+def add_rdp_dcom_delegate(graph, computers, it_users, it_groups, rng=random):
     count = int(math.floor(len(computers) * .1))
-    add_rdp_users(session, computers, it_users, count)
-    add_execute_dcom_users(session, computers, it_users, count)
-    add_rdp_groups(session, computers, it_groups, count)
-    add_execute_dcom_groups(session, computers, it_groups, count)
-    add_allowed_to_delegate_to_users(session, computers, it_users, count)
-    add_allowed_to_delegate_to_computers(session, computers, count)
-
-
-def add_sessions(session, num_nodes, computers, users, das):
+    computers = graph.resolve_all(("Computer", "name"), computers)
+    it_users = graph.resolve_all(("User", "name"), it_users)
+    it_groups = graph.resolve_all(("Group", "name"), it_groups)
+    add_rdp_users(graph, computers, it_users, count, rng)
+    add_execute_dcom_users(graph, computers, it_users, count, rng)
+    add_rdp_groups(graph, computers, it_groups, count, rng)
+    add_execute_dcom_groups(graph, computers, it_groups, count, rng)
+    add_allowed_to_delegate_to_users(graph, computers, it_users, count, rng)
+    add_allowed_to_delegate_to_computers(graph, computers, count, rng)
+
+
+def add_sessions(graph, num_nodes, computers, users, das, rng=random):
     """
     Adds sessions.
 
     Arguments:
-        session   -- the current session
+        graph     -- the domain graph the generated entities are added to
         num_nodes -- the number of nodes
         computers -- a list containing the various computers
         users     -- a list containing the various users
         das       -- domain administrators
+        rng       -- the random number generator the values are drawn from
     """
     max_sessions_per_user = int(math.ceil(math.log10(num_nodes)))
-    props = []
-    for user in users:
-        num_sessions = random.randrange(0, max_sessions_per_user)
+    das = set(das)
+
+    # Each computer and user is looked up once, then the sessions are
+    # drawn as indices into these lists and added without lookups
+    computer_ids = graph.resolve_all(("Computer", "name"), computers)
+    user_ids = graph.resolve_all(("User", "name"), users)
+    num_computers = len(computer_ids)
+    counts = rng.choices(range(max_sessions_per_user), k=len(users))
+    rand = rng.random
+
+    pairs = []
+    for user, user_id, num_sessions in zip(users, user_ids, counts):
         if user in das:
             num_sessions = max(num_sessions, 1)
 
         if num_sessions == 0:
             continue
 
-        for c in random.sample(computers, num_sessions):
-            props.append({'a': user, 'b': c})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props AS prop
-                MERGE (n:User {name:prop.a})
-                WITH n,prop
-                MERGE (m:Computer {name:prop.b})
-                WITH n,m
-                MERGE (m)-[:HasSession]->(n)
-                """,
-                props=props
-            )
-            props = []
+        # A few distinct computers out of many: redrawing the rare
+        # duplicates is much cheaper than random.sample
+        sampled = set()
+        while len(sampled) < num_sessions:
+            sampled.add(int(rand() * num_computers))
+
+        for c in sampled:
+            pairs.append((computer_ids[c], user_id))
 
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:User {name:prop.a})
-        WITH n,prop
-        MERGE (m:Computer {name:prop.b})
-        WITH n,m
-        MERGE (m)-[:HasSession]->(n)
-        """,
-        props=props
-    )
+    graph.add_edges("HasSession", pairs)
 
 
-def add_unconstrained_delegation(session, computers):
+def add_unconstrained_delegation(graph, computers, rng=random):
     """
     Add unconstrained delegation to some computers.
 
     Arguments:
-        session   -- the current session
+        graph     -- the domain graph the generated entities are added to
         computers -- a list containing the various computers
+        rng       -- the random number generator the values are drawn from
     """
-    i = random.randint(10, 20)
+    i = rng.randint(10, 20)
     i = min(i, len(computers))
-    for computer in random.sample(computers, i):
-        session.run(
-            """
-            MATCH (n:Computer {name:$computer})
-            SET n.unconstrainteddelegation=true
-            """,
-            computer=computer
-        )
+    graph.set_properties("Computer", "name", rng.sample(computers, i), {"unconstrainteddelegation": True})
@@ -1,151 +1,114 @@
 import random
-import uuid
 
-from adgen.utils.support_functions import cn
+from adgen.utils.support_functions import cn, generate_guid
 
 
-def create_default_gpos(session, domain_name, ddp, ddcp):
+def create_default_gpos(graph, domain_name, ddp, ddcp):
     """
     Create default GPOs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         ddp         -- default domain policy id
         ddcp        -- default domain controllers policy id
     """
-    base_statement = "MERGE (n:Base {name:$gpo, objectid:$guid}) SET n:GPO"
-    session.run(base_statement, gpo=cn("DEFAULT DOMAIN POLICY", domain_name), guid=ddp)
-    session.run(base_statement, gpo=cn("DEFAULT DOMAIN CONTROLLERS POLICY", domain_name), guid=ddcp)
+    graph.merge_nodes("GPO", [
+        {"id": ddp, "props": {"name": cn("DEFAULT DOMAIN POLICY", domain_name)}},
+        {"id": ddcp, "props": {"name": cn("DEFAULT DOMAIN CONTROLLERS POLICY", domain_name)}}
+    ])
 
 
-def link_default_gpos(session, domain_name, dcou):
+def link_default_gpos(graph, domain_name, dcou):
     """
     Links default GPOs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         dcou        -- domain controllers OU id
     """
     gpo_name = "DEFAULT DOMAIN POLICY@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:GPO {name:$gpo})
-        MERGE (m:Domain {name:$domain})
-        MERGE (n)-[:GpLink {isacl:false, enforced:toBoolean(false)}]->(m)
-        """,
-        gpo=gpo_name,
-        domain=domain_name
-    )
-
-    session.run(
-        """
-        MERGE (n:Domain {name:$domain})
-        MERGE (m:OU {objectid:$guid})
-        MERGE (n)-[:Contains {isacl:false}]->(m)
-        """,
-        domain=domain_name,
-        guid=dcou
-    )
+    graph.merge_edges("GpLink", ("GPO", "name"), ("Domain", "name"), [{'a': gpo_name, 'b': domain_name}],
+                       {"isacl": False, "enforced": False})
+    graph.merge_edges("Contains", ("Domain", "name"), ("OU", "objectid"), [{'a': domain_name, 'b': dcou}],
+                       {"isacl": False})
 
     gpo_name = "DEFAULT DOMAIN CONTROLLERS POLICY@{}".format(domain_name)
-    session.run(
-        """
-        MERGE (n:GPO {name:$gpo})
-        MERGE (m:OU {objectid:$guid})
-        MERGE (n)-[:GpLink {isacl:false, enforced:toBoolean(false)}]->(m)
-        """,
-        gpo=gpo_name,
-        guid=dcou
-    )
-
-
-def create_gpos(session, domain_name, gpos):
+    graph.merge_edges("GpLink", ("GPO", "name"), ("OU", "objectid"), [{'a': gpo_name, 'b': dcou}],
+                       {"isacl": False, "enforced": False})
+
+
+def create_gpos(graph, domain_name, gpos, rng=random):
     """
     Creates GPOs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         gpos        -- a list containing the various GPOs
+        rng         -- the random number generator the values are drawn from
 
     Returns:
         gpos -- a list containing the various GPOs
     """
+    props = []
     for i in range(1, 20):
         gpo_name = "GPO_{}@{}".format(i, domain_name)
-        guid = str(uuid.uuid4()).upper()
-        session.run(
-            """
-            MERGE (n:Base {name:$gponame})
-            SET n:GPO, n.objectid=$guid
-            """,
-            gponame=gpo_name,
-            guid=guid
-        )
+        guid = generate_guid(rng).upper()
+        props.append({"id": guid, "props": {"name": gpo_name}})
         gpos.append(gpo_name)
+
+    graph.merge_nodes("GPO", props)
     return gpos
 
 
-def link_gpos_to_ous(session, gpos, ou_names, ou_guid_map):
+def link_gpos_to_ous(graph, gpos, ou_names, ou_guid_map, rng=random):
     """
     Links GPOs to OUs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         gpos        -- a list containing the various GPOs
         ou_names    -- a list containing the names of the various OUs
         ou_guid_map -- a map of OUs guid
+        rng         -- the random number generator the values are drawn from
     """
+    props = []
     for g in gpos:
-        num_links = random.randint(1, 3)
-        linked_ous = random.sample(ou_names, num_links)
+        num_links = rng.randint(1, 3)
+        linked_ous = rng.sample(ou_names, num_links)
         for link in linked_ous:
             guid = ou_guid_map[link]
-            session.run(
-                """
-                MERGE (n:GPO {name:$gponame})
-                WITH n
-                MERGE (m:OU {objectid:$guid})
-                WITH n,m
-                MERGE (n)-[r:GpLink]->(m)
-                """,
-                gponame=g,
-                guid=guid
-            )
-
-
-def link_domain_to_ous(session, domain_name, ou_names, ou_guid_map):
+            props.append({'a': g, 'b': guid})
+
+    graph.merge_edges("GpLink", ("GPO", "name"), ("OU", "objectid"), props)
+
+
+def link_domain_to_ous(graph, domain_name, ou_names, ou_guid_map, rng=random):
     """
     Links domain to OUs.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         ou_names    -- a list containing the names of the various OUs
         ou_guid_map -- a map of OUs guid
+        rng         -- the random number generator the values are drawn from
     """
-    num_links = random.randint(1, 3)
-    linked_ous = random.sample(ou_names, num_links)
+    num_links = rng.randint(1, 3)
+    linked_ous = rng.sample(ou_names, num_links)
+    props = []
     for link in linked_ous:
         guid = ou_guid_map[link]
-        session.run(
-            """
-            MERGE (n:Domain {name:$gponame})
-            WITH n
-            MERGE (m:OU {objectid:$guid})
-            WITH n,m
-            MERGE (n)-[r:GpLink]->(m)
-            """,
-            gponame=domain_name,
-            guid=guid
-        )
-
-
-def link_to_ous(session, gpos, domain_name, ou_guid_map):
+        props.append({'a': domain_name, 'b': guid})
+
+    graph.merge_edges("GpLink", ("Domain", "name"), ("OU", "objectid"), props)
+
+
+def link_to_ous(graph, gpos, domain_name, ou_guid_map, rng=random):
     ou_names = list(ou_guid_map.keys())
-    link_domain_to_ous(session, domain_name, ou_names, ou_guid_map)
-    link_gpos_to_ous(session, gpos, ou_names, ou_guid_map)
+    link_domain_to_ous(graph, domain_name, ou_names, ou_guid_map, rng)
+    link_gpos_to_ous(graph, gpos, ou_names, ou_guid_map, rng)
     gpos.append("DEFAULT DOMAIN POLICY@{}".format(domain_name))
-    gpos.append("DEFAULT DOMAIN CONTROLLER POLICY@{}".format(domain_name))
+    gpos.append("DEFAULT DOMAIN CONTROLLERS POLICY@{}".format(domain_name))
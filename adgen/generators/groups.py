@@ -1,245 +1,220 @@
+import functools
 import math
 import random
 
-from adgen.utils.support_functions import cn, cs, cws, get_fixed_generation
+from adgen.utils.support_functions import allocate_quotas, assign_quotas, cn, cs, cws, map_shards, shard_rng, \
+     split_shards
 
 
-def create_domain_nodes(session, domain_name, domain_sid):
+# The well-known groups of every domain, as (rid, name, highvalue) tuples;
+# a string rid is a well-known sid, which is prefixed to the domain sid
+WELL_KNOWN_GROUPS = [
+    (512, "DOMAIN ADMINS", True),
+    (515, "DOMAIN COMPUTERS", False),
+    (513, "DOMAIN USERS", False),
+    (516, "DOMAIN CONTROLLERS", True),
+    ("S-1-5-9", "ENTERPRISE DOMAIN CONTROLLERS", True),
+    (498, "ENTERPRISE READ-ONLY DOMAIN CONTROLLERS", False),
+    (544, "ADMINISTRATORS", True),
+    (519, "ENTERPRISE ADMINS", True)
+]
+
+
+def create_well_known_groups(graph, domain_name, domain_sid):
     """
-    Creates the domain nodes.
+    Creates the well-known groups listed in WELL_KNOWN_GROUPS.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         domain_sid  -- the domain sid
     """
-    base_statement = "MERGE (n:Base {name: $gname}) SET n:Group, n.objectid=$sid"
-    session.run(f"{base_statement},n.highvalue=true", sid=cs(512, domain_sid), gname=cn("DOMAIN ADMINS", domain_name))
-    session.run(base_statement, sid=cs(515, domain_sid), gname=cn("DOMAIN COMPUTERS", domain_name))
-    session.run(base_statement, gname=cn("DOMAIN USERS", domain_name), sid=cs(513, domain_sid))
+    props = []
+    for rid, name, highvalue in WELL_KNOWN_GROUPS:
+        if isinstance(rid, str):
+            objectid = cws(rid, domain_sid)
+        else:
+            objectid = cs(rid, domain_sid)
+
+        group_props = {"name": cn(name, domain_name)}
+        if highvalue:
+            group_props["highvalue"] = True
+        props.append({"id": objectid, "props": group_props})
 
+    graph.merge_nodes("Group", props)
 
-def create_domain_controllers(session, domain_name, domain_sid):
+
+def create_domain(graph, domain_name, domain_sid):
     """
-    Creates the domain controllers.
+    Creates the domain.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         domain_sid  -- the domain sid
     """
-    base_statement = "MERGE (n:Base {name: $gname}) SET n:Group, n.objectid=$sid"
-    session.run(f"{base_statement},n.highvalue=true", gname=cn("DOMAIN CONTROLLERS", domain_name),
-                sid=cs(516, domain_sid))
+    graph.merge_nodes("Domain", [{"id": domain_sid, "props": {"name": domain_name, "highvalue": True}}])
 
-    session.run(f"{base_statement},n.highvalue=true", gname=cn("ENTERPRISE DOMAIN CONTROLLERS", domain_name),
-                sid=cws("S-1-5-9", domain_sid))
 
-    session.run(base_statement, gname=cn("ENTERPRISE READ-ONLY DOMAIN CONTROLLERS", domain_name),
-                sid=cs(498, domain_sid))
+def data_generation(graph, domain_name, domain_sid):
+    create_well_known_groups(graph, domain_name, domain_sid)
+    create_domain(graph, domain_name, domain_sid)
 
 
-def create_administrators(session, domain_name, domain_sid):
+def create_groups(graph, domain_name, domain_sid, num_nodes, groups, ridcount, groups_list, fixed_generation,
+                  rng=random, executor=None):
     """
-    Creates the administrators.
+    Creates groups. The groups are generated in shards, which can
+    be generated by separate processes.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         domain_sid  -- the domain sid
+        num_nodes   -- the number of nodes
+        groups      -- a list containing the various groups
+        ridcount    -- the current rid value
+        rng         -- the random number generator the values are drawn from
+        executor    -- a process pool the shards are generated in (optional)
+
+    Returns:
+        groups      -- a list containing the various groups
+        dept_groups -- a dictionary mapping each department (e.g., IT)
+                       to the list of its groups
+        ridcount    -- th new rid value
     """
-    base_statement = "MERGE (n:Base {name: $gname}) SET n:Group, n.objectid=$sid"
-    session.run(f"{base_statement},n.highvalue=true", gname=cn("ADMINISTRATORS", domain_name), sid=cs(544, domain_sid))
-    session.run(f"{base_statement},n.highvalue=true", gname=cn("ENTERPRISE ADMINS", domain_name),
-                sid=cs(519, domain_sid))
+    dept_groups = {}
 
+    quotas = allocate_quotas(num_nodes, groups_list) if fixed_generation else None
+    shards = [(offset, count, quotas) for offset, count in split_shards(num_nodes)]
 
-def create_domain(session, domain_name, domain_sid):
-    """
-    Creates the domain.
+    generate = functools.partial(generate_group_shard, domain_name, domain_sid, groups_list, ridcount,
+                                 rng.getrandbits(64))
 
-    Arguments:
-        session     -- the current session
-        domain_name -- the domain name
-        domain_sid  -- the domain sid
-    """
-    session.run(
-        """
-        MERGE (n:Base {name:$domain})
-        SET n:Domain, n.highvalue=true, n.objectid=$objectid
-        """,
-        domain=domain_name,
-        objectid=domain_sid
-    )
+    for depts, props in map_shards(generate, shards, executor):
+        for dept, group_props in zip(depts, props):
+            group_name = group_props["props"]["name"]
+            groups.append(group_name)
+            dept_groups.setdefault(dept, []).append(group_name)
 
+        graph.merge_nodes("Group", props)
 
-def data_generation(session, domain_name, domain_sid):
-    create_domain_nodes(session, domain_name, domain_sid)
-    create_domain_controllers(session, domain_name, domain_sid)
-    create_administrators(session, domain_name, domain_sid)
-    create_domain(session, domain_name, domain_sid)
+    return groups, dept_groups, ridcount + num_nodes
 
 
-def create_groups(session, domain_name, domain_sid, num_nodes, groups, ridcount, groups_list, fixed_generation):
+def generate_group_shard(domain_name, domain_sid, groups_list, ridcount, seed, shard):
     """
-    Creates groups.
+    Generates the properties of the groups of a shard.
 
     Arguments:
-        session     -- the current session
         domain_name -- the domain name
         domain_sid  -- the domain sid
-        num_nodes   -- the number of nodes
-        groups      -- a list containing the various groups
-        ridcount    -- the current rid value
+        groups_list -- a WeightedList containing the available groups
+        ridcount    -- the rid of the first group of the domain
+        seed        -- the seed the generators of the shards are created from
+        shard       -- the (offset, count, quotas) tuple of the shard, where
+                       quotas are the numbers of groups of each department
+                       in a fixed generation, and None otherwise
 
     Returns:
-        group_props_list -- a list containing the properties of the various groups
-        groups           -- a list containing the various groups
-        ridcount         -- th new rid value
-    """
+        depts -- a list containing the department of each group
+        props -- a list containing the properties of the groups
+    """
+    offset, count, quotas = shard
+    if quotas is not None:
+        fixed_list = assign_quotas(groups_list.options, quotas, offset, count)
+    else:
+        fixed_list = groups_list.sample(count, shard_rng(seed, offset))
+    depts = []
     props = []
-    group_props_list = []
 
-    fixed_list = get_fixed_generation(num_nodes, groups_list)
+    for i in range(offset + 1, offset + count + 1):
+        group = fixed_list[i - offset - 1]
+        depts.append(group)
+        props.append({
+            "id": cs(ridcount + i - 1, domain_sid),
+            "props": {
+                "name": "{}{:05d}@{}".format(group, i, domain_name)
+            }
+        })
 
-    for i in range(1, num_nodes + 1):
-        if fixed_generation:
-            group = fixed_list[i - 1]
-        else:
-            group = random.choice(groups_list)
-        group_name = "{}{:05d}@{}".format(group, i, domain_name)
-        groups.append(group_name)
-        sid = cs(ridcount, domain_sid)
-        ridcount += 1
-        group_props = {
-            "name": group_name,
-            "id": sid
-        }
-        props.append(group_props)
-        group_props_list.append(group_props)
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MERGE (n:Base {objectid:prop.id})
-                SET n:Group, n.name=prop.name
-                """,
-                props=props
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props as prop
-        MERGE (n:Base {objectid:prop.id})
-        SET n:Group, n.name=prop.name
-        """,
-        props=props
-    )
-    return group_props_list, groups, ridcount
-
-
-def add_domain_admins(session, domain_name, num_nodes, users):
+    return depts, props
+
+
+def add_domain_admins(graph, domain_name, num_nodes, users, rng=random):
     """
     Create domain administrators.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         domain_name -- the domain name
         num_nodes   -- the number of nodes
         users       -- a list containing the various users
+        rng         -- the random number generator the values are drawn from
 
     Returns:
         das -- domain administrators
     """
-    dapctint = random.randint(3, 5)
+    dapctint = rng.randint(3, 5)
     dapct = float(dapctint) / 100
     danum = int(math.ceil(num_nodes * dapct))
     danum = min([danum, 30])
     print("Creating {} Domain Admins ({}% of users capped at 30)".format(danum, dapctint))
-    das = random.sample(users, danum)
+    das = rng.sample(users, danum)
 
+    props = []
     for da in das:
-        session.run(
-            """
-            MERGE (n:User {name:$name})
-            WITH n
-            MERGE (m:Group {name:$gname})
-            WITH n,m
-            MERGE (n)-[:MemberOf]->(m)
-            """,
-            name=da,
-            gname=cn("DOMAIN ADMINS", domain_name))
+        props.append({'a': da, 'b': cn("DOMAIN ADMINS", domain_name)})
+
+    graph.merge_edges("MemberOf", ("User", "name"), ("Group", "name"), props)
     return das
 
 
-def create_nested_groups(session, num_nodes, groups):
+def create_nested_groups(graph, num_nodes, dept_groups, rng=random):
     """
-    Create nested groups.
+    Create nested groups, within the same department.
 
     Arguments:
-        session   -- the current session
-        num_nodes -- the number of nodes
-        groups    -- a list containing the various groups
+        graph       -- the domain graph the generated entities are added to
+        num_nodes   -- the number of nodes
+        dept_groups -- a dictionary mapping each department to its groups
+        rng         -- the random number generator the values are drawn from
     """
     max_nest = int(round(math.log10(num_nodes)))
-    props = []
+    pairs = []
+
+    for dpt_groups in dept_groups.values():
+        dpt_ids = graph.resolve_all(("Group", "name"), dpt_groups)
+        for group_id in dpt_ids:
+            if rng.randrange(0, 100) < 10:
+                num_nest = rng.randrange(1, max_nest)
+                if num_nest > len(dpt_ids):
+                    num_nest = rng.randrange(1, len(dpt_ids))
+                to_nest = rng.sample(dpt_ids, num_nest)
+                for g in to_nest:
+                    if not g == group_id:
+                        pairs.append((group_id, g))
+
+    graph.add_edges("MemberOf", pairs)
+
 
-    for group in groups:
-        if random.randrange(0, 100) < 10:
-            num_nest = random.randrange(1, max_nest)
-            dept = group[0:-19]
-            dpt_groups = [x for x in groups if dept in x]
-            if num_nest > len(dpt_groups):
-                num_nest = random.randrange(1, len(dpt_groups))
-            to_nest = random.sample(dpt_groups, num_nest)
-            for g in to_nest:
-                if not g == group:
-                    props.append({'a': group, 'b': g})
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props AS prop
-                MERGE (n:Group {name:prop.a})
-                WITH n,prop
-                MERGE (m:Group {name:prop.b})
-                WITH n,m
-                MERGE (n)-[:MemberOf]->(m)
-                """,
-                props=props
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:Group {name:prop.a})
-        WITH n,prop
-        MERGE (m:Group {name:prop.b})
-        WITH n,m
-        MERGE (n)-[:MemberOf]->(m)
-        """,
-        props=props)
-
-
-def add_users_to_group(session, num_nodes, users, groups, das, groups_list):
+def add_users_to_group(graph, num_nodes, users, dept_groups, das, groups_list, rng=random):
     """
-    Adds users to groups.
+    Adds users to groups of a random department.
 
     Arguments:
-        session     -- the current session
+        graph       -- the domain graph the generated entities are added to
         num_nodes   -- the number of nodes
         users       -- a list containing the various users
-        groups      -- a list containing the various groups
+        dept_groups -- a dictionary mapping each department to its groups
         das         -- domain administrators
-        groups_list -- a list containing the available groups
+        groups_list -- a WeightedList containing the available groups
+        rng         -- the random number generator the values are drawn from
 
     Returns:
         it_users -- a list of it users
     """
-    props = []
+    pairs = []
     a = math.log10(num_nodes)
     a = math.pow(a, 2)
     a = math.floor(a)
@@ -250,47 +225,30 @@ def add_users_to_group(session, num_nodes, users, groups, das, groups_list):
 
     print("Calculated {} groups per user with a variance of - {}".format(num_groups_base, variance * 2))
 
-    for user in users:
-        dept = random.choice(groups_list)
+    # The users and the groups are looked up once, and the groups
+    # are then sampled by id
+    user_ids = graph.resolve_all(("User", "name"), users)
+    dept_ids = {dept: graph.resolve_all(("Group", "name"), groups) for dept, groups in dept_groups.items()}
+
+    for user, user_id, dept in zip(users, user_ids, groups_list.sample(len(users), rng)):
         if dept == "IT":
             it_users.append(user)
-        possible_groups = [x for x in groups if dept in x]
+        possible_groups = dept_ids.get(dept, [])
 
-        sample = num_groups_base + random.randrange(-(variance * 2), 0)
+        sample = num_groups_base + rng.randrange(-(variance * 2), 0)
         if sample > len(possible_groups):
             sample = int(math.floor(float(len(possible_groups)) / 4))
 
         if sample <= 1:
             continue
 
-        to_add = random.sample(possible_groups, sample)
-
-        for group in to_add:
-            props.append({'a': user, 'b': group})
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props AS prop
-                MERGE (n:User {name:prop.a})
-                WITH n,prop
-                MERGE (m:Group {name:prop.b})
-                WITH n,m
-                MERGE (n)-[:MemberOf]->(m)
-                """,
-                props=props)
-            props = []
-
-    session.run(
-        """
-        UNWIND $props AS prop
-        MERGE (n:User {name:prop.a})
-        WITH n,prop
-        MERGE (m:Group {name:prop.b})
-        WITH n,m
-        MERGE (n)-[:MemberOf]->(m)
-        """,
-        props=props)
+        for group_id in rng.sample(possible_groups, sample):
+            pairs.append((user_id, group_id))
+
+    graph.add_edges("MemberOf", pairs)
 
+    # Duplicates are dropped keeping the first occurrence, so that
+    # the order does not depend on the hashes of the names
     it_users = it_users + das
-    it_users = list(set(it_users))
+    it_users = list(dict.fromkeys(it_users))
     return it_users
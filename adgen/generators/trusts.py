@@ -0,0 +1,30 @@
+# The properties of the trusts between the domains of a forest
+TRUST_PROPS = {
+    "isacl": False,
+    "trusttype": "ParentChild",
+    "transitive": True,
+    "sidfiltering": False
+}
+
+
+def add_trusts(graph, root_sid, domain_sids):
+    """
+    Links the root domain of a forest to each of its child domains
+    with a two-way parent-child trust, i.e., with a TrustedBy
+    relationship in each direction. The domains are merged without
+    properties, so that the trusts can be added to a graph which
+    does not contain the domains themselves.
+
+    Arguments:
+        graph       -- the domain graph the relationships are added to
+        root_sid    -- the sid of the root domain
+        domain_sids -- a list containing the sids of the child domains
+    """
+    graph.merge_nodes("Domain", [{"id": sid, "props": {}} for sid in [root_sid] + domain_sids])
+
+    props = []
+    for sid in domain_sids:
+        props.append({'a': root_sid, 'b': sid})
+        props.append({'a': sid, 'b': root_sid})
+
+    graph.merge_edges("TrustedBy", ("Domain", "objectid"), ("Domain", "objectid"), props, TRUST_PROPS)
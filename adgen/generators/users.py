@@ -1,14 +1,38 @@
+import functools
 import random
 
-from adgen.utils.support_functions import cs, generate_timestamp
+from adgen.utils.support_functions import BATCH_SIZE, cs, generate_timestamps, map_shards, shard_rng, split_shards
 
 
-def create_users(session, domain_name, domain_sid, num_nodes, current_time, first_names, last_names, users, ridcount):
+# The first names and last names of the users generated by a worker
+# process, sent once when the process starts rather than with every shard
+_name_pools = None
+
+
+def set_name_pools(first_names, last_names):
+    """
+    Sets the names the users generated by this process are drawn from.
+    It is meant as the initializer of the process pool the shards of
+    the users are generated in.
+
+    Arguments:
+        first_names -- a list of first names that can be used for a user
+        last_names  -- a list of last names that can be used for a user
+    """
+    global _name_pools
+    _name_pools = (first_names, last_names)
+
+
+def create_users(graph, domain_name, domain_sid, num_nodes, current_time, first_names, last_names, users, ridcount,
+                 rng=random, executor=None):
     """
-    Creates the user nodes.
+    Creates the user nodes, one batch at a time. The users are
+    generated in shards, each one with its own rids and random
+    number generator, so that the shards can be generated by
+    separate processes and still give the same users.
 
     Arguments:
-        session      -- the current session
+        graph        -- the domain graph the generated entities are added to
         domain_name  -- the domain name
         domain_sid   -- the domain sid
         num_nodes    -- the number of nodes
@@ -17,91 +41,138 @@ def create_users(session, domain_name, domain_sid, num_nodes, current_time, firs
         last_names   -- a list of last names that can be used for a user
         users        -- a vector containing that will contain the usernames of the various users
         ridcount     -- the current rid value
+        rng          -- the random number generator the values are drawn from
+        executor     -- a process pool the shards are generated in (optional),
+                        whose processes were initialized by set_name_pools
+                        with the same names
 
     Returns:
-        user_props -- a vector containing the properties of the various users
-        users      -- a vector containing the usernames of the various users
-        ridcount   -- the new rid value
+        users    -- a vector containing the usernames of the various users
+        ridcount -- the new rid value
     """
-    user_props = []
     group_name = "DOMAIN USERS@{}".format(domain_name)
-    props = []
-
-    for i in range(1, num_nodes + 1):
-        first = random.choice(first_names)
-        last = random.choice(last_names)
-        user_name = "{}{}{:05d}@{}".format(first[0], last, i, domain_name).upper()
-        user_name = user_name.format(first[0], last, i).upper()
-        users.append(user_name)
-        dispname = "{} {}".format(first, last)
-        enabled = True
-        pwdlastset = generate_timestamp(current_time)
-        lastlogon = generate_timestamp(current_time)
-        ridcount += 1
-        objectsid = cs(ridcount, domain_sid)
-
-        user_properties = {
-            'id': objectsid,
-            'props': {
-                'displayname': dispname,
-                'name': user_name,
-                'enabled': enabled,
-                'pwdlastset': pwdlastset,
-                'lastlogon': lastlogon
-            }
-        }
-
-        props.append(user_properties)
-        user_props.append(user_properties)
-
-        if len(props) > 500:
-            session.run(
-                """
-                UNWIND $props as prop
-                MERGE (n:Base {objectid:prop.id})
-                SET n:User, n += prop.props
-                WITH n
-                MATCH (m:Group {name:$gname})
-                WITH n,m
-                MERGE (n)-[:MemberOf]->(m)
-                """,
-                props=props,
-                gname=group_name
-            )
-            props = []
-
-    session.run(
-        """
-        UNWIND $props as prop
-        MERGE (n:Base {objectid:prop.id})
-        SET n:User, n += prop.props
-        WITH n
-        MATCH (m:Group {name:$gname})
-        WITH n,m
-        MERGE (n)-[:MemberOf]->(m)
-        """,
-        props=props,
-        gname=group_name
-    )
-
-    return user_props, users, ridcount
-
-
-def add_kerberoastable_users(session, it_users):
+    generate = functools.partial(generate_user_shard, domain_name, domain_sid, current_time, ridcount,
+                                 rng.getrandbits(64))
+    if executor is None:
+        generate = functools.partial(generate, name_pools=(first_names, last_names))
+
+    for batches in map_shards(generate, split_shards(num_nodes), executor):
+        for batch in batches:
+            merge_users(graph, batch, group_name)
+            users.extend(prop['props']['name'] for prop in batch)
+
+    return users, ridcount + num_nodes
+
+
+def generate_user_shard(domain_name, domain_sid, current_time, ridcount, seed, shard, name_pools=None):
+    """
+    Generates the properties of the users of a shard.
+
+    Arguments:
+        domain_name  -- the domain name
+        domain_sid   -- the domain sid
+        current_time -- the current time
+        ridcount     -- the rid of the first user of the domain
+        seed         -- the seed the generators of the shards are created from
+        shard        -- the (offset, count) tuple of the shard
+        name_pools   -- a (first names, last names) tuple; if None, the
+                        names set by set_name_pools are used
+
+    Returns:
+        A list of batches, each containing the properties of some users
+    """
+    if name_pools is None:
+        name_pools = _name_pools
+    if name_pools is None:
+        raise Exception("ERROR: the process generating the users was not initialized with set_name_pools")
+
+    first_names, last_names = name_pools
+    offset, count = shard
+    return list(generate_users(domain_name, domain_sid, count, current_time, first_names, last_names,
+                               ridcount + offset, rng=shard_rng(seed, offset), first=offset + 1))
+
+
+def generate_users(domain_name, domain_sid, num_nodes, current_time, first_names, last_names, ridcount,
+                   batch_size=BATCH_SIZE, rng=random, first=1):
+    """
+    Generates the properties of the users, one batch at a time,
+    so that only a batch is kept in memory.
+
+    Arguments:
+        domain_name  -- the domain name
+        domain_sid   -- the domain sid
+        num_nodes    -- the number of nodes
+        current_time -- the current time
+        first_names  -- a list of first names that can be used for a user
+        last_names   -- a list of last names that can be used for a user
+        ridcount     -- the rid of the first user
+        batch_size   -- the number of users of each batch
+        rng          -- the random number generator the values are drawn from
+        first        -- the number of the first user, used in its name
+
+    Returns:
+        A generator of lists, each containing the properties of
+        at most batch_size users
+    """
+    domain_name = domain_name.upper()
+    initials = [name[0].upper() for name in first_names]
+    surnames = [last.upper() for last in last_names]
+    first_indices = range(len(first_names))
+    last_indices = range(len(last_names))
+
+    # The random values of a whole batch are drawn at once, and the
+    # properties of its users are then built from them
+    for start in range(first, first + num_nodes, batch_size):
+        count = min(batch_size, first + num_nodes - start)
+        firsts = rng.choices(first_indices, k=count)
+        lasts = rng.choices(last_indices, k=count)
+        pwdlastsets = generate_timestamps(current_time, count, rng)
+        lastlogons = generate_timestamps(current_time, count, rng)
+
+        props = []
+        for j in range(count):
+            first_index = firsts[j]
+            last_index = lasts[j]
+            props.append({
+                'id': cs(ridcount + j, domain_sid),
+                'props': {
+                    'displayname': "{} {}".format(first_names[first_index], last_names[last_index]),
+                    'name': "{}{}{:05d}@{}".format(initials[first_index], surnames[last_index], start + j,
+                                                   domain_name),
+                    'enabled': True,
+                    'pwdlastset': pwdlastsets[j],
+                    'lastlogon': lastlogons[j]
+                }
+            })
+
+        ridcount += count
+        yield props
+
+
+def merge_users(graph, props, group_name):
+    """
+    Adds some users and makes them members of a group.
+
+    Arguments:
+        graph      -- the domain graph the generated entities are added to
+        props      -- a list containing the properties of the users
+        group_name -- the name of the group the users are members of
+    """
+    graph.merge_nodes("User", props)
+    group_id = graph.resolve(("Group", "name"), group_name)
+    ids = graph.resolve_all(("User", "objectid"), [prop['id'] for prop in props])
+    graph.add_edges("MemberOf", [(node_id, group_id) for node_id in ids])
+
+
+def add_kerberoastable_users(graph, it_users, rng=random):
     """
     Makes some users vulnerable to a kerberoast attack.
 
     Arguments:
-        session  -- the current session
+        graph    -- the domain graph the generated entities are added to
         it_users -- a list of it users
+        rng      -- the random number generator the values are drawn from
     """
-    i = random.randint(10, 20)
+    i = rng.randint(10, 20)
     i = min(i, len(it_users))
-    for user in random.sample(it_users, i):
-        session.run(
-            """
-            MATCH (n:User {name:$user})
-            SET n.hasspn=true
-            """,
-            user=user
-        )
+    graph.set_properties("User", "name", rng.sample(it_users, i), {"hasspn": True})
@@ -31,8 +31,17 @@ def initialize(args):
     pool = Pool()
 
     db_settings.connected = False
+    db_settings.defer_schema = args.get('defer_schema') or DEFAULT_DB_SETTINGS.get('defer_schema')
+    db_settings.recreate_db = args.get('recreate_db') or DEFAULT_DB_SETTINGS.get('recreate_db')
+    db_settings.batch_size = args.get('batch_size') or DEFAULT_DB_SETTINGS.get('batch_size')
+    db_settings.transactions = args.get('transactions') or DEFAULT_DB_SETTINGS.get('transactions')
+    db_settings.workers = args.get('workers') or DEFAULT_DB_SETTINGS.get('workers')
+    db_settings.async_mode = args.get('async_mode') or DEFAULT_DB_SETTINGS.get('async_mode')
     domain_settings.current_time = DEFAULT_DOMAIN_SETTINGS.get('current_time')
     domain_settings.sid = DEFAULT_DOMAIN_SETTINGS.get('sid')
+    domain_settings.seed = args.get('seed')
+    domain_settings.processes = args.get('processes') or DEFAULT_DOMAIN_SETTINGS.get('processes')
+    domain_settings.domains = args.get('domains') or DEFAULT_DOMAIN_SETTINGS.get('domains')
     pool.first_names = DEFAULT_POOL.get('first_names')
     pool.last_names = DEFAULT_POOL.get('last_names')
 
@@ -43,6 +52,21 @@ def initialize(args):
         db_settings.password = get_value_from_ini("CONNECTION", "password", args.get('conn'))
         domain_settings.domain = get_value_from_ini("CONNECTION", "domain", args.get('conn'))
 
+        if args.get('batch_size') is None:
+            db_settings.batch_size = get_value_from_ini("CONNECTION", "batch_size", args.get('conn'),
+                                                        db_settings.batch_size)
+        if not args.get('transactions'):
+            db_settings.transactions = get_value_from_ini("CONNECTION", "transactions", args.get('conn'),
+                                                          db_settings.transactions)
+        if args.get('workers') is None:
+            db_settings.workers = get_value_from_ini("CONNECTION", "workers", args.get('conn'), db_settings.workers)
+        if args.get('processes') is None:
+            domain_settings.processes = get_value_from_ini("CONNECTION", "processes", args.get('conn'),
+                                                           domain_settings.processes)
+        if args.get('domains') is None:
+            domain_settings.domains = get_value_from_ini("CONNECTION", "domains", args.get('conn'),
+                                                         domain_settings.domains)
+
         if args.get('nodes_distr') is not None:
             config_distributions(args.get('nodes_distr'), domain_settings)
         else:
@@ -85,4 +109,16 @@ def initialize(args):
             domain_settings.nodes = DEFAULT_DOMAIN_SETTINGS.get('nodes')
             domain_settings.domain = DEFAULT_DOMAIN_SETTINGS.get('domain')
 
+    if domain_settings.seed is not None:
+        domain_settings.current_time = DEFAULT_DOMAIN_SETTINGS.get('seed_time')
+
+    if db_settings.batch_size <= 0:
+        raise Exception("ERROR: the batch size must be positive.")
+    if db_settings.workers <= 0:
+        raise Exception("ERROR: the number of workers must be positive.")
+    if domain_settings.processes <= 0:
+        raise Exception("ERROR: the number of processes must be positive.")
+    if domain_settings.domains <= 0:
+        raise Exception("ERROR: the number of domains must be positive.")
+
     return db_settings, domain_settings, pool
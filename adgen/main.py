@@ -1,24 +1,28 @@
 import sys
 
 from adgen.cl_parser import parse_args
-from adgen.commands.interactive_mode import interactive
-from adgen.commands.run_mode import run, check_run_args
-from adgen.commands.config_mode import config, check_config_args
 
 
 def main():
-    """ Main routine of adgen """
+    """
+    Main routine of adgen. Each command is imported once the arguments
+    are parsed, so that --help and invalid arguments never import the
+    driver, the generators or the data files.
+    """
     args = parse_args(sys.argv[1:])
     cmd = args.command
     cmd_params = vars(args)
 
     try:
         if cmd == "interactive":
+            from adgen.commands.interactive_mode import interactive
             interactive(cmd_params)
         elif cmd == "run":
+            from adgen.commands.run_mode import run, check_run_args
             check_run_args(cmd_params)
             run(cmd_params)
         elif cmd == "config":
+            from adgen.commands.config_mode import config, check_config_args
             check_config_args(cmd_params)
             config(cmd_params)
     except Exception as err:
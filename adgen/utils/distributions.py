@@ -1,5 +1,4 @@
 import random
-import yaml
 
 from adgen.default_config import DEFAULT_DOMAIN_SETTINGS
 
@@ -73,7 +72,8 @@ def generate_random_value(domain_settings, distr, val_1, val_2):
     Generates a random value of nodes based on the distribution.
     A maximum of 3 attempts are made; if in 3 attempts you do not
     get a value greater than 100 the value of the nodes to be
-    generated will be equal to the default value.
+    generated will be equal to the default value. The value is
+    drawn from a generator seeded with the seed of the domain, if any.
 
     Arguments:
         domain_settings -- the entity to which to configure the nodes
@@ -81,18 +81,21 @@ def generate_random_value(domain_settings, distr, val_1, val_2):
         val_1           -- first parameter of the distribution
         val_2           -- second parameter of the distribution
     """
+    # The distribution is kept, so that the other domains of a forest are sized from it
+    domain_settings.distribution = (distr, val_1, val_2)
+    rng = random.Random(domain_settings.seed)
     tmp = 0
     counter = 0
 
     while counter < 3:
         if distr == "uniform":
-            tmp = random.uniform(val_1, val_2)
+            tmp = rng.uniform(val_1, val_2)
         elif distr == "triangular":
-            tmp = random.triangular(val_1, val_2)
+            tmp = rng.triangular(val_1, val_2)
         elif distr == "gauss":
-            tmp = random.gauss(val_1, val_2)
+            tmp = rng.gauss(val_1, val_2)
         elif distr == "gamma":
-            tmp = random.gammavariate(val_1, val_2)
+            tmp = rng.gammavariate(val_1, val_2)
 
         if tmp < 100:
             counter += 1
@@ -254,6 +257,8 @@ def config_distributions(args, domain_settings):
         args            -- the distribution entered by the user
         domain_settings -- the entity to which to configure the domain
     """
+    import yaml
+
     path = args
 
     with open(path) as fh:
@@ -1,7 +1,40 @@
+import functools
+import math
 import os
 import pickle
 
+from collections.abc import Mapping
 from configparser import ConfigParser
+from adgen.entities.weighted_list import WeightedList
+
+
+class LazyPool(Mapping):
+    """
+    A pool of values, each one loaded from its file the first time it
+    is used, so that commands which do not generate anything never
+    read the data files, and the sections of a .ini file which are
+    replaced by another file (e.g., in config mode) are never read.
+    """
+
+    def __init__(self, loaders):
+        """
+        Arguments:
+            loaders -- a dictionary mapping each key of the pool to
+                       the function loading its value
+        """
+        self.loaders = loaders
+        self.values = {}
+
+    def __getitem__(self, key):
+        if key not in self.values:
+            self.values[key] = self.loaders[key]()
+        return self.values[key]
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
 
 
 def get_list_from_pkl(args):
@@ -29,23 +62,34 @@ def get_list_from_ini(list_name, path):
         path      -- the name of the .ini file
 
     Returns:
-        The list found, consisting of the options each
-        multiplied by the associated value
+        A WeightedList containing the options found, each one
+        weighted by the associated value
     """
-    config = ConfigParser()
-    config.optionxform = str
-    config.read(path)
+    config = read_ini(path)
 
     section = list_name
-    generic_list = []
+    options = config.options(section)
+    weights = [_get_weight(config, section, opt) for opt in options]
+    return WeightedList(options, weights)
 
-    for opt in config.options(section):
-        for frequency in range(0, config.getint(section, opt)):
-            generic_list.append(opt)
-    return generic_list
+
+def _get_weight(config, section, opt):
+    """
+    Retrieve the weight of an option, which can be fractional.
+
+    Arguments:
+        config  -- the parsed .ini file
+        section -- the name of the section
+        opt     -- the name of the option
+
+    Returns:
+        The weight, as an int if it is a whole number
+    """
+    weight = config.getfloat(section, opt)
+    return int(weight) if weight.is_integer() else weight
 
 
-def get_value_from_ini(list_name, opt_name, path):
+def get_value_from_ini(list_name, opt_name, path, fallback=None):
     """
     Retrieve a specific value inside a .ini file.
 
@@ -53,24 +97,65 @@ def get_value_from_ini(list_name, opt_name, path):
         list_name -- the name of the section to retrieve
         opt_name  -- the name of the option to retrieve
         path      -- the name of the .ini file
+        fallback  -- the value returned if the option is missing
 
     Returns:
         The value associated with the specified section and option
     """
-    config = ConfigParser()
-    config.optionxform = str
-    config.read(path)
+    config = read_ini(path)
 
     section = list_name
 
-    if opt_name == 'nodes':
+    if fallback is not None and not config.has_option(section, opt_name):
+        return fallback
+
+    if opt_name in ('nodes', 'batch_size', 'workers', 'processes', 'domains'):
         return config.getint(section, opt_name)
+    elif opt_name == 'transactions':
+        return config.getboolean(section, opt_name)
     elif opt_name == 'domain':
         return (config.get(section, opt_name)).upper()
     else:
         return config.get(section, opt_name)
 
 
+def read_ini(path):
+    """
+    Parses a .ini file. Each file is only parsed once, as long as
+    it is not modified, however many values are read from it.
+
+    Arguments:
+        path -- the name of the .ini file
+
+    Returns:
+        The parsed file, which must not be modified
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    return _parse_ini(path, mtime)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_ini(path, mtime):
+    """
+    Parses a .ini file.
+
+    Arguments:
+        path  -- the name of the .ini file
+        mtime -- the modification time of the file, so that a modified
+                 file is parsed again
+
+    Returns:
+        The parsed file
+    """
+    config = ConfigParser()
+    config.optionxform = str
+    config.read(path)
+    return config
+
+
 def check_ini_file(path):
     """
     This function performs checks on the sections within a .ini file.
@@ -111,11 +196,12 @@ def check_ini_file(path):
         sum = 0
 
         for opt in config.options(section):
-            if config.getint(section, opt) < 0:
+            if config.getfloat(section, opt) < 0:
                 return -2
-            sum += config.getint(section, opt)
+            sum += config.getfloat(section, opt)
 
-        if sum != 100:
+        # The values can be fractional, so they are summed with some tolerance
+        if not math.isclose(sum, 100):
             return -2
 
     return 0
@@ -1,5 +1,21 @@
+import collections
+import contextlib
+import concurrent.futures
+import gc
+import heapq
 import random
 import itertools
+import uuid
+
+
+# The number of entities generated at once by the streaming generators
+BATCH_SIZE = 500
+
+# The number of entities of each shard generated by a separate process
+SHARD_SIZE = 20000
+
+# The maximum number of shards submitted to the processes and not yet merged
+SHARDS_AHEAD = 8
 
 
 def cn(name, domain):
@@ -45,22 +61,36 @@ def cws(domain, sid):
     return f"{domain}-{str(sid)}"
 
 
-def generate_timestamp(current_time):
+def generate_timestamps(current_time, count, rng=random):
     """
-    Creates a timestamp.
+    Creates some timestamps at once: each one is -1, 0 or a time
+    within the year before current_time, with the same probability.
 
     Arguments:
         current_time -- the current time
+        count        -- the number of timestamps
+        rng          -- the random number generator the values are drawn from
+
+    Returns:
+        A list containing the generated timestamps
+    """
+    rand = rng.random
+    return [current_time - int(rand() * 31536001) if choice == 1 else choice
+            for choice in rng.choices((-1, 0, 1), k=count)]
+
+
+def generate_guid(rng=random):
+    """
+    Creates a random (version 4) GUID from a random number generator,
+    so that the GUIDs of a seeded generation are reproducible.
+
+    Arguments:
+        rng -- the random number generator the GUID is drawn from
 
     Returns:
-        The generated timestamp
+        The GUID, as a string
     """
-    choice = random.randint(-1, 1)
-    if choice == 1:
-        variation = random.randint(0, 31536000)
-        return current_time - variation
-    else:
-        return choice
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
 
 
 def split_seq(iterable, size):
@@ -78,65 +108,163 @@ def split_seq(iterable, size):
         item = list(itertools.islice(it, size))
 
 
-def get_fixed_generation(num_nodes, generic_list):
+def allocate_quotas(num_nodes, generic_list):
     """
     This function allows you to have a fixed generation
-    of nodes, i.e., the number of nodes in the specified
-    list will not be approximately equal to the percentage
+    of nodes, i.e., the number of nodes with each option
+    will not be approximately equal to the percentage
     indicated in the .ini configuration file but will be
-    exactly equal to the percentage.
+    exactly equal to the percentage. The nodes are split
+    with the largest remainder method: each option gets
+    the whole part of its share, and the nodes left are
+    given to the options with the largest remainders.
 
     Arguments:
         num_nodes    -- number of nodes to generate
-        generic_list -- list of which you want to have a
-                        fixed generation
+        generic_list -- the WeightedList of which you want to
+                        have a fixed generation
 
     Returns:
-        A list containing for each "entry" the exact number
+        A list containing for each option the exact number
         of nodes to be generated
     """
-    dictionary = {}
+    total = sum(generic_list.weights)
+    if total <= 0:
+        raise Exception("ERROR: the weights of a fixed generation must not all be zero.")
+
+    counts = []
+    remainders = []
+    for weight in generic_list.weights:
+        count, remainder = divmod(num_nodes * weight, total)
+        counts.append(int(count))
+        remainders.append(remainder)
+
+    left = num_nodes - sum(counts)
+    for i in heapq.nlargest(left, range(len(counts)), key=remainders.__getitem__):
+        counts[i] += 1
+    return counts
+
+
+def assign_quotas(options, counts, offset, count):
+    """
+    Assigns the options to some of the nodes of a fixed generation.
+    The options are assigned in order, each one to as many nodes as
+    its count, and only the options of the requested nodes are built,
+    so that a shard never holds the options of the whole generation.
+
+    Arguments:
+        options -- a list containing the options
+        counts  -- the number of nodes of each option (see allocate_quotas)
+        offset  -- the index of the first node
+        count   -- the number of nodes
+
+    Returns:
+        A list containing the option of each node
+    """
+    assigned = []
+    start = 0
+    for option, option_count in zip(options, counts):
+        first = max(start, offset)
+        last = min(start + option_count, offset + count)
+        if first < last:
+            assigned.extend([option] * (last - first))
+        start += option_count
+    return assigned
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic garbage collector. Generating a domain allocates
+    millions of tuples and dictionaries without reference cycles, which
+    the collector would otherwise traverse again and again.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 
-    tmp_string = generic_list[0]
-    tmp_value = 1
+def split_shards(num_nodes, shard_size=SHARD_SIZE):
+    """
+    Splits a number of entities into shards.
 
-    for i in range(1, len(generic_list)):
-        if generic_list[i] == tmp_string:
-            tmp_value += 1
-        else:
-            dictionary[tmp_string] = tmp_value
-            tmp_string = generic_list[i]
-            tmp_value = 1
+    Arguments:
+        num_nodes  -- the number of entities
+        shard_size -- the maximum number of entities of a shard
 
-    dictionary[tmp_string] = tmp_value
+    Returns:
+        A list of (offset, count) tuples, one for each shard
+    """
+    return [(offset, min(shard_size, num_nodes - offset)) for offset in range(0, num_nodes, shard_size)]
 
-    generated_nodes = 0
 
-    for k in dictionary.keys():
-        percentage = round((num_nodes * dictionary.get(k)) / 100)
-        dictionary[k] = percentage
-        generated_nodes += percentage
+def shard_rng(seed, offset):
+    """
+    Creates the random number generator of a shard. Each shard draws
+    its values from its own generator, seeded with the seed of the
+    generation and the offset of the shard, so that the generated
+    entities do not depend on the process generating them.
 
-    i = 0
+    Arguments:
+        seed   -- the seed of the generation
+        offset -- the offset of the shard
 
-    while generated_nodes != num_nodes:
-        if generated_nodes > num_nodes:
-            dictionary[list(dictionary.keys())[i]] = dictionary.get(list(dictionary.keys())[i]) - 1
-            generated_nodes -= 1
-        elif generated_nodes < num_nodes:
-            dictionary[list(dictionary.keys())[i]] = dictionary.get(list(dictionary.keys())[i]) + 1
-            generated_nodes += 1
+    Returns:
+        The random number generator of the shard
+    """
+    return random.Random("{}-{}".format(seed, offset))
 
-        if i == len(dictionary.keys()) - 1:
-            i = 0
-        else:
-            i += 1
 
-    result = []
+def map_shards(function, shards, executor=None):
+    """
+    Generates some shards, in order.
 
-    for k in dictionary.keys():
-        value = dictionary.get(k)
-        for i in range(value):
-            result.append(k)
+    Arguments:
+        function -- the function generating a shard
+        shards   -- a list containing the shards
+        executor -- a process pool the shards are generated in; if None,
+                    they are generated in the current process
+
+    Returns:
+        A generator of the results of the function, one for each shard
+    """
+    if executor is None:
+        yield from map(function, shards)
+        return
+
+    # Only a few shards are submitted ahead of the one being merged,
+    # so that the results waiting to be merged are bounded
+    pending = collections.deque()
+    for shard in shards:
+        pending.append(executor.submit(function, shard))
+        if len(pending) >= SHARDS_AHEAD:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+@contextlib.contextmanager
+def shard_executor(processes, initializer=None, initargs=()):
+    """
+    Creates the process pool the shards are generated in.
+
+    Arguments:
+        processes   -- the number of processes; if 1, the shards are
+                       generated in the current process and no pool
+                       is created
+        initializer -- a function each process calls once when it
+                       starts, e.g., to receive large values shared by
+                       every shard (optional)
+        initargs    -- the arguments passed to the initializer
+    """
+    if processes <= 1:
+        yield None
+        return
 
-    return result
+    with concurrent.futures.ProcessPoolExecutor(processes, initializer=initializer, initargs=initargs) as executor:
+        yield executor
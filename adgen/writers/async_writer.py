@@ -0,0 +1,257 @@
+import asyncio
+import time
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.writers.batch_writer import RETRY_DELAY, is_transient, summarize_timings
+from adgen.writers.neo4j_writer import node_statement, edge_statement
+
+
+QUEUE_SIZE = 8
+
+
+class GraphStream:
+    """
+    Listens to a domain graph while it is generated and puts its
+    changes, as batches of rows, on a bounded queue read by the
+    event loop. Putting a batch blocks the generating thread while
+    the queue is full, so at most queue size batches wait in memory.
+    """
+
+    def __init__(self, loop, queue, batch_size=500):
+        """
+        Arguments:
+            loop       -- the event loop reading the queue
+            queue      -- the asyncio queue the batches are put on
+            batch_size -- the maximum number of rows of a batch
+        """
+        self.loop = loop
+        self.queue = queue
+        self.batch_size = batch_size
+        self.pending_nodes = {}
+        self.pending_edges = {}
+        self.closed = False
+
+    def nodes(self, label, rows):
+        """
+        Adds some node rows, putting the batches filled on the queue.
+
+        Arguments:
+            label -- the label of the nodes
+            rows  -- a list of dictionaries, each containing the objectid
+                     of a node ('id') and its new properties ('props')
+        """
+        self._add(self.pending_nodes, label, rows)
+
+    def edges(self, rel_type, rows):
+        """
+        Adds some relationship rows, putting the batches filled on the queue.
+        The pending nodes are put first, so that a relationship never
+        reaches the database before its nodes.
+
+        Arguments:
+            rel_type -- the type of the relationships
+            rows     -- a list of dictionaries, each containing the objectids
+                        of the start ('a') and end ('b') nodes and the
+                        properties of the relationship ('props')
+        """
+        pending = self.pending_edges.setdefault(rel_type, [])
+        pending.extend(rows)
+
+        if len(pending) >= self.batch_size:
+            self._flush(self.pending_nodes)
+            self._put_full(self.pending_edges, rel_type)
+
+    def close(self, error=False):
+        """
+        Puts the rows still pending on the queue, nodes first, and
+        then the end of the stream.
+
+        Arguments:
+            error -- if True, the generation failed and the pending rows
+                     are dropped
+        """
+        if not error:
+            self._flush(self.pending_nodes)
+            self._flush(self.pending_edges)
+        self._put(None)
+
+    def _add(self, pending_map, name, rows):
+        """
+        Adds some rows to the pending ones with the same name.
+
+        Arguments:
+            pending_map -- the pending rows, by label or type
+            name        -- the label or the type of the rows
+            rows        -- the rows to add
+        """
+        pending = pending_map.setdefault(name, [])
+        pending.extend(rows)
+
+        if len(pending) >= self.batch_size:
+            self._put_full(pending_map, name)
+
+    def _put_full(self, pending_map, name):
+        """
+        Puts on the queue the full batches of the rows with a name.
+
+        Arguments:
+            pending_map -- the pending rows, by label or type
+            name        -- the label or the type of the rows
+        """
+        pending = pending_map[name]
+        while len(pending) >= self.batch_size:
+            self._put((pending_map is self.pending_nodes, name, pending[:self.batch_size]))
+            del pending[:self.batch_size]
+
+    def _flush(self, pending_map):
+        """
+        Puts on the queue every pending row of a map.
+
+        Arguments:
+            pending_map -- the pending rows, by label or type
+        """
+        for name, pending in pending_map.items():
+            while pending:
+                self._put((pending_map is self.pending_nodes, name, pending[:self.batch_size]))
+                del pending[:self.batch_size]
+
+    def _put(self, item):
+        """
+        Puts an item on the queue, waiting for a free slot.
+
+        Arguments:
+            item -- a (is node batch, name, rows) tuple, or None
+        """
+        if self.closed:
+            raise Exception("ERROR: the database writer stopped, generation aborted")
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+
+class AsyncNeo4jWriter:
+    """
+    Writes a domain graph into a Neo4j database with the async
+    driver while the graph is being generated: the generation runs
+    in a separate thread and its batches are written as soon as
+    they are filled, so sampling and writing overlap.
+    """
+
+    def __init__(self, driver, batch_size=500, transactions=False, queue_size=QUEUE_SIZE, retries=3):
+        """
+        Arguments:
+            driver       -- the async driver the session is opened from
+            batch_size   -- the maximum number of rows sent by each statement
+            transactions -- if True, each batch runs in an explicit write
+                            transaction, retried on transient errors
+            queue_size   -- the maximum number of batches waiting to be written
+            retries      -- how many times an auto-commit batch is run again
+                            after a transient error
+        """
+        self.driver = driver
+        self.batch_size = batch_size
+        self.transactions = transactions
+        self.queue_size = queue_size
+        self.retries = retries
+        self.timings = []
+
+    async def write(self, generate):
+        """
+        Generates a domain graph and writes it while it grows.
+
+        Arguments:
+            generate -- a function which adds the domain to the graph
+                        it is given
+
+        Returns:
+            graph -- the generated domain graph
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        stream = GraphStream(loop, queue, self.batch_size)
+        producer = loop.run_in_executor(None, _produce, generate, stream)
+
+        try:
+            async with self.driver.session() as session:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+
+                    is_node, name, rows = item
+                    statement = node_statement(name) if is_node else edge_statement(name)
+                    start = time.perf_counter()
+                    await self._run(session, statement, rows)
+                    self.timings.append((name, len(rows), time.perf_counter() - start))
+        except BaseException:
+            # Unblock the generating thread, which then stops
+            stream.closed = True
+            while not queue.empty():
+                queue.get_nowait()
+            raise
+
+        return await producer
+
+    async def _run(self, session, statement, batch):
+        """
+        Runs a statement over a single batch.
+
+        Arguments:
+            session   -- the async session used to run the statement
+            statement -- the statement to run
+            batch     -- a list containing the rows of the batch
+        """
+        if self.transactions:
+            await session.execute_write(_run_statement, statement, batch)
+            return
+
+        for attempt in range(self.retries + 1):
+            try:
+                await _run_statement(session, statement, batch)
+                return
+            except Exception as err:
+                if attempt == self.retries or not is_transient(err):
+                    raise
+                await asyncio.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def report(self):
+        """
+        Returns:
+            A dictionary mapping each label and relationship type to
+            the number of batches, the number of rows and the seconds
+            spent writing them
+        """
+        return summarize_timings(self.timings)
+
+
+def _produce(generate, stream):
+    """
+    Generates a domain graph followed by a stream, and ends the stream.
+
+    Arguments:
+        generate -- a function which adds the domain to the graph it is given
+        stream   -- the stream following the graph
+
+    Returns:
+        graph -- the generated domain graph
+    """
+    graph = DomainGraph(listener=stream, retain=False)
+    try:
+        generate(graph)
+    except BaseException:
+        if not stream.closed:
+            stream.close(error=True)
+        raise
+    stream.close()
+    return graph
+
+
+async def _run_statement(runner, statement, batch):
+    """
+    Runs a statement and waits for its result.
+
+    Arguments:
+        runner    -- an async session or transaction
+        statement -- the statement to run
+        batch     -- a list containing the rows bound to $props
+    """
+    result = await runner.run(statement, props=batch)
+    await result.consume()
@@ -0,0 +1,126 @@
+import time
+
+from adgen.utils.support_functions import split_seq
+
+
+RETRY_DELAY = 0.5
+
+
+class BatchWriter:
+    """
+    Runs an UNWIND statement over a list of rows, sending the rows
+    in batches of bounded size and recording how long each batch took.
+    """
+
+    def __init__(self, session, batch_size=500, transactions=False, retries=3):
+        """
+        Arguments:
+            session      -- the session used to run the statements
+            batch_size   -- the maximum number of rows sent by each statement
+            transactions -- if True, each batch runs in an explicit write
+                            transaction (session.execute_write), which the
+                            driver retries on transient errors; otherwise it
+                            runs in an auto-commit transaction
+            retries      -- how many times an auto-commit batch is run again
+                            after a transient error (e.g., a deadlock)
+        """
+        self.session = session
+        self.batch_size = batch_size
+        self.transactions = transactions
+        self.retries = retries
+        self.timings = []
+
+    def write(self, statement, rows, name=None):
+        """
+        Runs a statement over some rows, one batch at a time.
+        The rows of a batch are bound to the $props parameter.
+
+        Arguments:
+            statement -- the statement to run
+            rows      -- a list containing the rows to send
+            name      -- the name under which the batches are timed
+                         (e.g., the label of the nodes written)
+        """
+        for batch in split_seq(rows, self.batch_size):
+            start = time.perf_counter()
+            self._run(statement, batch)
+            self.timings.append((name, len(batch), time.perf_counter() - start))
+
+    def _run(self, statement, batch):
+        """
+        Runs a statement over a single batch.
+
+        Arguments:
+            statement -- the statement to run
+            batch     -- a list containing the rows of the batch
+        """
+        if self.transactions:
+            self.session.execute_write(_run_statement, statement, batch)
+            return
+
+        for attempt in range(self.retries + 1):
+            try:
+                _run_statement(self.session, statement, batch)
+                return
+            except Exception as err:
+                if attempt == self.retries or not is_transient(err):
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+
+    def report(self):
+        """
+        Sums up the recorded timings.
+
+        Returns:
+            A dictionary mapping each name to the number of batches,
+            the number of rows and the seconds spent writing them
+        """
+        return summarize_timings(self.timings)
+
+
+def is_transient(err):
+    """
+    Tells whether an error is transient (e.g., a deadlock), so that
+    the statement failing with it can be run again. The driver is only
+    imported once an error occurs, so that exporting to files never
+    imports it.
+
+    Arguments:
+        err -- the error raised by a statement
+
+    Returns:
+        True if the error is transient, False otherwise
+    """
+    from neo4j.exceptions import TransientError
+
+    return isinstance(err, TransientError)
+
+
+def summarize_timings(timings):
+    """
+    Sums up some batch timings by name.
+
+    Arguments:
+        timings -- a list of (name, rows, seconds) tuples, one for each batch
+
+    Returns:
+        A dictionary mapping each name to the number of batches,
+        the number of rows and the seconds spent writing them
+    """
+    report = {}
+    for name, rows, seconds in timings:
+        batches, total_rows, total_seconds = report.get(name, (0, 0, 0.0))
+        report[name] = (batches + 1, total_rows + rows, total_seconds + seconds)
+    return report
+
+
+def _run_statement(runner, statement, batch):
+    """
+    Runs a statement and waits for its result.
+
+    Arguments:
+        runner    -- a session or a transaction
+        statement -- the statement to run
+        batch     -- a list containing the rows bound to $props
+    """
+    runner.run(statement, props=batch).consume()
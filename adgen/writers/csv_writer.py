@@ -0,0 +1,123 @@
+import csv
+import os
+
+
+class CsvWriter:
+    """
+    Writes a domain graph as node and relationship CSV files
+    in the format expected by 'neo4j-admin database import'.
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path -- the directory where the CSV files are written
+        """
+        self.path = path
+
+    def write(self, graph):
+        """
+        Writes one CSV file for each node label and one for each
+        relationship type. As with a MERGE, a relationship between
+        the same nodes is only written once.
+
+        Arguments:
+            graph -- the domain graph to write
+
+        Returns:
+            node_files -- a list containing the paths of the node files
+            rel_files  -- a list containing the paths of the relationship files
+        """
+        os.makedirs(self.path, exist_ok=True)
+        node_files = []
+        rel_files = []
+
+        for label, table in sorted(graph.nodes.items()):
+            keys = _collect_keys(table.values())
+            file_path = os.path.join(self.path, "nodes_{}.csv".format(label))
+
+            with open(file_path, "w", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(["objectid:ID"] + _header(keys) + [":LABEL"])
+                for objectid, node in table.items():
+                    writer.writerow([objectid] + _values(node, keys) + ["Base;" + label])
+            node_files.append(file_path)
+
+        for rel_type in sorted(graph.edges):
+            edges = list(graph.unique_edges(rel_type))
+
+            keys = _collect_keys(props for a, b, props in edges)
+            file_path = os.path.join(self.path, "rels_{}.csv".format(rel_type))
+
+            with open(file_path, "w", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow([":START_ID", ":END_ID"] + _header(keys) + [":TYPE"])
+                for a, b, props in edges:
+                    writer.writerow([a, b] + _values(props, keys) + [rel_type])
+            rel_files.append(file_path)
+
+        return node_files, rel_files
+
+
+def _collect_keys(prop_maps):
+    """
+    Collects the property keys used by some nodes or relationships.
+
+    Arguments:
+        prop_maps -- an iterable of property dictionaries
+
+    Returns:
+        A dictionary mapping each property key to a sample value
+    """
+    keys = {}
+    for props in prop_maps:
+        for key, value in props.items():
+            if key != "objectid" and keys.get(key) is None:
+                keys[key] = value
+    return keys
+
+
+def _header(keys):
+    """
+    Builds the typed header columns of the given properties.
+
+    Arguments:
+        keys -- a dictionary mapping each property key to a sample value
+
+    Returns:
+        A list of header columns (e.g., ['name', 'enabled:boolean'])
+    """
+    header = []
+    for key, value in keys.items():
+        if isinstance(value, bool):
+            header.append(key + ":boolean")
+        elif isinstance(value, int):
+            header.append(key + ":long")
+        elif isinstance(value, float):
+            header.append(key + ":double")
+        else:
+            header.append(key)
+    return header
+
+
+def _values(props, keys):
+    """
+    Formats the values of a node or relationship.
+
+    Arguments:
+        props -- the properties of the node or relationship
+        keys  -- a dictionary mapping each property key to a sample value
+
+    Returns:
+        A list of formatted values, one for each key
+    """
+    values = []
+    for key in keys:
+        value = props.get(key)
+        if value is None:
+            values.append("")
+        elif isinstance(value, bool):
+            values.append("true" if value else "false")
+        else:
+            values.append(value)
+    return values
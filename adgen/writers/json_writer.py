@@ -0,0 +1,41 @@
+import json
+
+
+class JsonWriter:
+    """
+    Writes a domain graph as a single JSON document containing
+    a list of nodes and a list of relationships.
+    """
+
+    def __init__(self, path):
+        """
+        Arguments:
+            path -- the path of the JSON file to write
+        """
+        self.path = path
+
+    def write(self, graph):
+        """
+        Writes the nodes and the relationships of the graph, each
+        relationship between the same nodes only once.
+
+        Arguments:
+            graph -- the domain graph to write
+        """
+        with open(self.path, "w") as fh:
+            fh.write('{"nodes": [')
+            first = True
+            for label, table in graph.nodes.items():
+                for objectid, props in table.items():
+                    fh.write(("" if first else ",") + "\n")
+                    json.dump({"objectid": objectid, "labels": ["Base", label], "properties": props}, fh)
+                    first = False
+
+            fh.write('\n], "relationships": [')
+            first = True
+            for rel_type in graph.edges:
+                for a, b, props in graph.unique_edges(rel_type):
+                    fh.write(("" if first else ",") + "\n")
+                    json.dump({"type": rel_type, "start": a, "end": b, "properties": props}, fh)
+                    first = False
+            fh.write("\n]}\n")
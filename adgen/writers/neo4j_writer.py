@@ -0,0 +1,334 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from adgen.utils.support_functions import split_seq
+from adgen.writers.batch_writer import BatchWriter, summarize_timings
+
+
+SCHEMA = {
+    "base_objectid": "CREATE CONSTRAINT base_objectid IF NOT EXISTS FOR (n:Base) REQUIRE n.objectid IS UNIQUE",
+    "base_name": "CREATE INDEX base_name IF NOT EXISTS FOR (n:Base) ON (n.name)",
+    "user_name": "CREATE INDEX user_name IF NOT EXISTS FOR (n:User) ON (n.name)",
+    "computer_name": "CREATE INDEX computer_name IF NOT EXISTS FOR (n:Computer) ON (n.name)",
+    "group_name": "CREATE INDEX group_name IF NOT EXISTS FOR (n:Group) ON (n.name)",
+    "domain_name": "CREATE INDEX domain_name IF NOT EXISTS FOR (n:Domain) ON (n.name)",
+    "ou_name": "CREATE INDEX ou_name IF NOT EXISTS FOR (n:OU) ON (n.name)",
+    "gpo_name": "CREATE INDEX gpo_name IF NOT EXISTS FOR (n:GPO) ON (n.name)"
+}
+
+CLEAR_BATCH_SIZE = 10000
+
+
+class Neo4jWriter:
+    """
+    Writes a domain graph into a Neo4j database by running
+    batched Cypher statements through a session.
+    """
+
+    def __init__(self, session, batch_size=500, defer_schema=False, transactions=False):
+        """
+        Arguments:
+            session      -- the session used to run the statements
+            batch_size   -- the maximum number of rows sent by each statement
+            defer_schema -- if True, the nodes and the relationships are
+                            created without looking them up and the schema
+                            is only set once all the nodes have been written
+                            (the database must not contain any of the nodes
+                            of the graph)
+            transactions -- if True, each batch runs in an explicit write
+                            transaction, retried on transient errors
+        """
+        self.session = session
+        self.batch_size = batch_size
+        self.defer_schema = defer_schema
+        self.transactions = transactions
+        self.batches = BatchWriter(session, batch_size, transactions)
+        self.duplicates = {}
+
+    def write(self, graph):
+        """
+        Writes the nodes of the graph, label by label, and then
+        its relationships, type by type. The duplicate relationships
+        dropped are counted in duplicates, by type.
+
+        Arguments:
+            graph -- the domain graph to write
+        """
+        self.write_stage(node_statements(graph, self.defer_schema))
+
+        if self.defer_schema:
+            create_schema(self.session)
+
+        statements = edge_statements(graph, self.defer_schema)
+        for rel_type, count in graph.duplicates.items():
+            self.duplicates[rel_type] = self.duplicates.get(rel_type, 0) + count
+        self.write_stage(statements)
+
+    def write_stage(self, statements):
+        """
+        Runs some statements, each one over its own rows.
+
+        Arguments:
+            statements -- a list of (statement, rows, name) tuples
+        """
+        for statement, rows, name in statements:
+            self.batches.write(statement, rows, name)
+
+    def report(self):
+        """
+        Returns:
+            A dictionary mapping each label and relationship type to
+            the number of batches, the number of rows and the seconds
+            spent writing them
+        """
+        return self.batches.report()
+
+    def close(self):
+        """Closes the underlying session."""
+        self.session.close()
+
+
+class ParallelNeo4jWriter(Neo4jWriter):
+    """
+    Writes a domain graph into a Neo4j database by sending its
+    batches from a pool of threads, each one with its own session.
+    All the nodes are written before the relationships referencing
+    them, so only the batches of the same stage run concurrently.
+    """
+
+    def __init__(self, driver, workers=4, batch_size=500, defer_schema=False, transactions=False):
+        """
+        Arguments:
+            driver       -- the driver the sessions are opened from
+            workers      -- the number of threads writing the batches
+            batch_size   -- the maximum number of rows sent by each statement
+            defer_schema -- if True, the nodes and the relationships are
+                            created without looking them up and the schema
+                            is only set once all the nodes have been written
+            transactions -- if True, each batch runs in an explicit write
+                            transaction, retried on transient errors
+        """
+        super().__init__(driver.session(), batch_size, defer_schema, transactions)
+        self.driver = driver
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.writers = []
+
+    def write_stage(self, statements):
+        """
+        Runs the batches of some statements concurrently and waits
+        for all of them to be written.
+
+        Arguments:
+            statements -- a list of (statement, rows, name) tuples
+        """
+        futures = []
+        for statement, rows, name in statements:
+            for batch in split_seq(rows, self.batch_size):
+                futures.append(self.executor.submit(self._write_batch, statement, batch, name))
+
+        for future in futures:
+            future.result()
+
+    def _write_batch(self, statement, batch, name):
+        """
+        Writes a single batch with the session of the current thread.
+
+        Arguments:
+            statement -- the statement to run
+            batch     -- a list containing the rows of the batch
+            name      -- the name under which the batch is timed
+        """
+        writer = getattr(self.local, "writer", None)
+        if writer is None:
+            writer = BatchWriter(self.driver.session(), self.batch_size, self.transactions)
+            self.local.writer = writer
+            with self.lock:
+                self.writers.append(writer)
+
+        writer.write(statement, batch, name)
+
+    def report(self):
+        """
+        Returns:
+            A dictionary mapping each label and relationship type to
+            the number of batches, the number of rows and the seconds
+            spent writing them, summed over all the threads
+        """
+        return summarize_timings([timing for writer in self.writers for timing in writer.timings])
+
+    def close(self):
+        """Stops the threads and closes every session."""
+        self.executor.shutdown()
+        for writer in self.writers:
+            writer.session.close()
+        self.session.close()
+
+
+def node_statement(label, create=False):
+    """
+    Builds the statement writing a batch of nodes with a label.
+
+    Arguments:
+        label  -- the label of the nodes
+        create -- if True, the nodes are created without looking them up
+
+    Returns:
+        The statement, which expects the rows in $props
+    """
+    node_clause = "CREATE" if create else "MERGE"
+    return """
+        UNWIND $props AS prop
+        """ + node_clause + """ (n:Base {objectid:prop.id})
+        SET n:""" + label + """, n += prop.props
+        """
+
+
+def edge_statement(rel_type, create=False):
+    """
+    Builds the statement writing a batch of relationships of a type.
+    The nodes are always written before their relationships, so they
+    are only looked up, through the unique objectid constraint.
+
+    Arguments:
+        rel_type -- the type of the relationships
+        create   -- if True, the relationships are created without
+                    looking them up (none of them must exist already)
+
+    Returns:
+        The statement, which expects the rows in $props
+    """
+    rel_clause = "CREATE" if create else "MERGE"
+    return """
+        UNWIND $props AS prop
+        MATCH (n:Base {objectid:prop.a})
+        MATCH (m:Base {objectid:prop.b})
+        """ + rel_clause + """ (n)-[r:""" + rel_type + """]->(m)
+        SET r += prop.props
+        """
+
+
+def node_statements(graph, create=False):
+    """
+    Builds the statements writing the nodes of a graph,
+    one for each label.
+
+    Arguments:
+        graph  -- the domain graph to write
+        create -- if True, the nodes are created without looking them up
+
+    Returns:
+        A list of (statement, rows, label) tuples
+    """
+    statements = []
+
+    for label, table in graph.nodes.items():
+        rows = [{"id": objectid, "props": props} for objectid, props in table.items()]
+        statements.append((node_statement(label, create), rows, label))
+    return statements
+
+
+def edge_statements(graph, create=False):
+    """
+    Builds the statements writing the relationships of a graph,
+    one for each type. A relationship between the same nodes is
+    only sent once, so that concurrent batches never race to
+    MERGE the same relationship, and so that the relationships
+    can be created when none of them is in the database yet.
+
+    Arguments:
+        graph  -- the domain graph to write
+        create -- if True, the relationships are created without
+                  looking them up
+
+    Returns:
+        A list of (statement, rows, type) tuples
+    """
+    statements = []
+
+    for rel_type in graph.edges:
+        rows = [{"a": a, "b": b, "props": props} for a, b, props in graph.unique_edges(rel_type)]
+        statements.append((edge_statement(rel_type, create), rows, rel_type))
+    return statements
+
+
+def create_schema(session):
+    """
+    Creates the uniqueness constraint on the objectid of the nodes
+    and the indexes on their names, which are used to look up the
+    nodes while writing. Existing constraints and indexes are kept.
+
+    Arguments:
+        session -- the session used to run the statements
+    """
+    for statement in SCHEMA.values():
+        session.run(statement)
+
+
+def drop_schema(session):
+    """
+    Drops the constraints and the indexes created by create_schema.
+
+    Arguments:
+        session -- the session used to run the statements
+    """
+    for name in SCHEMA.keys():
+        if name == "base_objectid":
+            session.run("DROP CONSTRAINT " + name + " IF EXISTS")
+        else:
+            session.run("DROP INDEX " + name + " IF EXISTS")
+
+
+def clear_database(session, batch_size=CLEAR_BATCH_SIZE):
+    """
+    Deletes every relationship and then every node of the database,
+    at most batch_size of them in each transaction, so that the
+    memory used by a transaction stays bounded whatever the size of
+    the database. The progress is printed after each batch.
+
+    Arguments:
+        session    -- the session used to run the statements
+        batch_size -- the maximum number of entities deleted by each transaction
+    """
+    statements = [
+        ("relationships", "MATCH ()-[r]->() WITH r LIMIT $batch DELETE r RETURN count(r) AS deleted"),
+        ("nodes", "MATCH (n) WITH n LIMIT $batch DETACH DELETE n RETURN count(n) AS deleted")
+    ]
+
+    for entity, statement in statements:
+        total = 0
+        while True:
+            deleted = session.run(statement, batch=batch_size).single()["deleted"]
+            total += deleted
+            print("\rDeleted {} {}".format(total, entity), end="")
+            if deleted < batch_size:
+                break
+        print("")
+
+
+def recreate_database(driver):
+    """
+    Drops the current database and creates it again, which is much
+    faster than deleting its content. This is only allowed by servers
+    supporting 'CREATE OR REPLACE DATABASE' (e.g., Neo4j 5 Enterprise).
+
+    Arguments:
+        driver -- the driver connected to the server
+
+    Returns:
+        True if the database has been recreated, False otherwise
+    """
+    try:
+        session = driver.session()
+        name = session.run("CALL db.info() YIELD name").single()["name"]
+        session.close()
+
+        session = driver.session(database="system")
+        session.run("CREATE OR REPLACE DATABASE $name WAIT", name=name).consume()
+        session.close()
+    except Exception as err:
+        print("Could not recreate the database: {error}".format(error=err))
+        return False
+    return True
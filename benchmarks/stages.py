@@ -0,0 +1,319 @@
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows, where the peak RSS is not measured
+    resource = None
+
+import adgen.db as db
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.initializer import initialize
+from adgen.utils.support_functions import gc_paused
+from adgen.writers.neo4j_writer import Neo4jWriter, node_statement, edge_statement
+
+
+# The number of nodes of the domains benchmarked by default
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+DEFAULT_SEED = 1
+
+
+class RecordingResult:
+    """The result of a statement which was not run"""
+
+    def consume(self):
+        pass
+
+
+class RecordingSession:
+    """
+    A session which counts the statements and the rows it is sent
+    instead of running them, so that the benchmark only measures
+    adgen, and keeps none of the rows.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def run(self, statement, **params):
+        self.statements += 1
+        self.rows += len(params["props"])
+        return RecordingResult()
+
+    def close(self):
+        pass
+
+
+class StageRecorder:
+    """
+    Listens to a domain graph and keeps the rows added or updated
+    since the beginning of the current stage, by label and type, as
+    the async writer would send them.
+    """
+
+    def __init__(self):
+        self.nodes_rows = {}
+        self.edges_rows = {}
+
+    def nodes(self, label, rows):
+        self.nodes_rows.setdefault(label, []).extend(rows)
+
+    def edges(self, rel_type, rows):
+        self.edges_rows.setdefault(rel_type, []).extend(rows)
+
+    def statements(self):
+        """
+        Returns:
+            A list of (statement, rows, name) tuples writing the rows
+            of the stage, the nodes before the relationships
+        """
+        statements = [(node_statement(label), rows, label) for label, rows in self.nodes_rows.items()]
+        statements += [(edge_statement(rel_type), rows, rel_type) for rel_type, rows in self.edges_rows.items()]
+        return statements
+
+    def clear(self):
+        self.nodes_rows = {}
+        self.edges_rows = {}
+
+
+def peak_rss():
+    """
+    Returns:
+        The peak resident set size of the process so far, in bytes,
+        or None where it cannot be measured
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageBenchmark:
+    """
+    Measures the stages of the generation of a domain. Each stage
+    is generated into the graph, and the rows it added are then
+    written with a Neo4jWriter to a recording session.
+
+    The peak RSS of the process is recorded after each stage, so the
+    stage which raised it stands out. Tracing the memory allocated by
+    each stage is more precise, but makes the generation several
+    times slower, so the timings of a traced run are not comparable
+    with those of an untraced one.
+    """
+
+    def __init__(self, batch_size=500, trace_memory=False):
+        """
+        Arguments:
+            batch_size   -- the maximum number of rows sent by each statement
+            trace_memory -- if True, the peak and the growth of the memory
+                            allocated by each stage are traced
+        """
+        self.session = RecordingSession()
+        self.writer = Neo4jWriter(self.session, batch_size)
+        self.recorder = StageRecorder()
+        self.graph = DomainGraph(listener=self.recorder)
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measures the code run in its block as a stage.
+
+        Arguments:
+            name -- the name of the stage
+        """
+        self.recorder.clear()
+        statements = self.session.statements
+        rows = self.session.rows
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        yield
+        generated = time.perf_counter()
+        self.writer.write_stage(self.recorder.statements())
+        written = time.perf_counter()
+
+        result = {
+            "name": name,
+            "seconds": generated - start,
+            "write_seconds": written - generated,
+            "statements": self.session.statements - statements,
+            "rows": self.session.rows - rows,
+            "peak_rss": peak_rss(),
+            "peak_memory": None,
+            "memory_growth": None
+        }
+        self.recorder.clear()
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            result["peak_memory"] = peak
+            result["memory_growth"] = current - memory
+        self.stages.append(result)
+
+
+@gc_paused()
+def run_stages(domain_settings, pool, bench):
+    """
+    Generates a domain running the stages of generate_domain one
+    after the other, measuring each stage.
+
+    Arguments:
+        domain_settings -- the entity containing the settings of the domain
+        pool            -- the entity containing the pool of values
+        bench           -- the StageBenchmark measuring the stages
+    """
+    for name, stage in db.domain_stages(domain_settings, pool):
+        with bench.stage(name):
+            stage(bench.graph)
+
+
+def benchmark(nodes, seed=DEFAULT_SEED, batch_size=500, trace_memory=False):
+    """
+    Benchmarks the stages of the generation of a domain.
+
+    Arguments:
+        nodes        -- the number of nodes of the domain
+        seed         -- the seed of the domain
+        batch_size   -- the maximum number of rows sent by each statement
+        trace_memory -- if True, the memory allocated by each stage is traced
+
+    Returns:
+        A dictionary containing the number of nodes and relationships
+        generated and a list of the measures of each stage
+    """
+    _, domain_settings, pool = initialize({'command': 'run', 'domain': 'TESTLAB.LOCAL', 'nodes_val': nodes,
+                                           'seed': seed})
+    bench = StageBenchmark(batch_size, trace_memory)
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        run_stages(domain_settings, pool, bench)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        "nodes": nodes,
+        "graph_nodes": bench.graph.count_nodes(),
+        "graph_relationships": bench.graph.count_edges(),
+        "stages": bench.stages
+    }
+
+
+def git_commit():
+    """
+    Returns:
+        The hash of the commit checked out, or None outside of a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """
+    Compares the stages of two benchmark results.
+
+    Arguments:
+        old -- the results of the baseline run
+        new -- the results of the run to compare
+
+    Returns:
+        A list of (nodes, stage, old seconds, new seconds, old peak RSS,
+        new peak RSS) tuples, for the sizes and stages of both runs
+    """
+    old_stages = {(run["nodes"], stage["name"]): stage for run in old["runs"] for stage in run["stages"]}
+    rows = []
+
+    for run in new["runs"]:
+        for stage in run["stages"]:
+            before = old_stages.get((run["nodes"], stage["name"]))
+            if before is not None:
+                rows.append((run["nodes"], stage["name"], before["seconds"], stage["seconds"],
+                             before["peak_rss"], stage["peak_rss"]))
+    return rows
+
+
+def print_run(run):
+    """
+    Prints the measures of the stages of a run.
+
+    Arguments:
+        run -- the results of a benchmarked domain
+    """
+    print("{} nodes: {} nodes and {} relationships generated".format(run["nodes"], run["graph_nodes"],
+                                                                     run["graph_relationships"]))
+    for stage in run["stages"]:
+        peak = stage["peak_rss"] if stage["peak_memory"] is None else stage["peak_memory"]
+        memory = "-" if peak is None else "{:.1f}MB".format(peak / 2 ** 20)
+        print("  {:<30} {:8.3f}s {:8.3f}s write {:>10} peak {:8} statements {:10} rows".format(
+            stage["name"], stage["seconds"], stage["write_seconds"], memory, stage["statements"], stage["rows"]))
+
+
+def main(argv=None):
+    """ Runs the benchmark and stores its results as JSON """
+    parser = argparse.ArgumentParser(prog='benchmarks.stages', description='Benchmarks the generation stages of adgen')
+    parser.add_argument('--nodes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of nodes of the '
+                        'domains to benchmark')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='seed of the benchmarked domains')
+    parser.add_argument('--batch-size', type=int, default=500, help='maximum number of rows sent by each statement')
+    parser.add_argument('--trace-memory', action='store_true', help='trace the memory allocated by each stage, '
+                        'which slows the generation down')
+    parser.add_argument('--output', type=str, help='path of the JSON file where to store the results (default '
+                        'benchmark-<commit>.json)')
+    parser.add_argument('--compare', type=str, help='path of the JSON results of a previous run to compare with')
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "batch_size": args.batch_size,
+        "trace_memory": args.trace_memory,
+        "runs": []
+    }
+
+    # The peak RSS never decreases, so the smaller domains go first
+    for nodes in sorted(args.nodes):
+        run = benchmark(nodes, args.seed, args.batch_size, args.trace_memory)
+        print_run(run)
+        results["runs"].append(run)
+
+    output = args.output or "benchmark-{}.json".format(commit or "unknown")
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print("Results written to {}".format(output))
+
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            old = json.load(fh)
+        print("Compared with {} ({})".format(args.compare, old.get("commit")))
+        for nodes, name, old_seconds, new_seconds, old_peak, new_peak in compare(old, results):
+            memory = ""
+            if old_peak and new_peak:
+                memory = "  peak x{:.2f}".format(new_peak / old_peak)
+            print("  {:>8} {:<30} {:8.3f}s -> {:8.3f}s  x{:.2f}{}".format(
+                nodes, name, old_seconds, new_seconds, new_seconds / old_seconds if old_seconds else 0, memory))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
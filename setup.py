@@ -25,7 +25,7 @@ setup(name='adgen',
                    'Programming Language :: Python :: 3.6',
                    'Programming Language :: Python :: 3.7',
                    ],
-      packages=find_packages(exclude=('tests',)),
+      packages=find_packages(exclude=('tests', 'benchmarks')),
       include_package_data=True,
       install_requires=[],
       entry_points={
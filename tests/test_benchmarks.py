@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import json
+import os
+import adgen.db as db
+
+from adgen.initializer import initialize
+from benchmarks.stages import benchmark, compare, main
+
+
+def test_benchmark():
+    """Test if every stage is measured, and every row generated is sent to the recording session"""
+    run = benchmark(100, trace_memory=True)
+    stages = {stage["name"]: stage for stage in run["stages"]}
+
+    # The stages are the ones run by generate_domain, in the same order
+    db_settings, domain_settings, pool = initialize({"command": "interactive"})
+    assert list(stages) == [name for name, stage in db.domain_stages(domain_settings, pool)]
+    assert {"create_users", "add_sessions", "add_outbound_acls", "create_ous_gpos"} <= set(stages)
+    # 100 users, each one with a node row and a MemberOf DOMAIN USERS row
+    assert stages["create_users"]["rows"] == 200
+    assert stages["create_users"]["statements"] == 2
+    assert all(stage["peak_memory"] > 0 for stage in run["stages"])
+    # Every relationship added is sent, as the duplicates are not dropped
+    assert sum(stage["rows"] for stage in run["stages"]) >= run["graph_relationships"]
+
+
+def test_benchmark_results(tmp_path):
+    """Test if the results are stored as JSON and compared by size and stage"""
+    old_path = os.path.join(str(tmp_path), "old.json")
+    new_path = os.path.join(str(tmp_path), "new.json")
+    main(["--nodes", "50", "--output", old_path])
+    main(["--nodes", "50", "100", "--output", new_path, "--compare", old_path])
+
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+
+    assert [run["nodes"] for run in new["runs"]] == [50, 100]
+    rows = compare(old, new)
+    assert [row[:2] for row in rows] == [(50, stage["name"]) for stage in old["runs"][0]["stages"]]
@@ -12,6 +12,8 @@ import adgen.db as db
 
 from adgen.cl_parser import parse_args
 from adgen.initializer import initialize
+from adgen.entities.domain_graph import DomainGraph
+from adgen.writers.neo4j_writer import Neo4jWriter
 from unittest import mock
 
 
@@ -219,6 +221,11 @@ def test_generate_data():
 
     db.test_db_connection(db_settings)
     session = db_settings.driver.session()
+    graph = DomainGraph()
+    graph.stamp(None, {"domain": domain_settings.domain})
+    graph.stamp("User", {"owned": False})
+    graph.stamp("Computer", {"owned": False})
+    writer = Neo4jWriter(session)
     db.cleardb(db_settings, "a")
 
     computers = []
@@ -229,8 +236,9 @@ def test_generate_data():
     ou_props = []
 
     # Data generation
-    db.data_generation(session, domain_settings.domain, domain_settings.sid)
+    db.data_generation(graph, domain_settings.domain, domain_settings.sid)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n) RETURN n"):
         result.append(r)
@@ -241,8 +249,9 @@ def test_generate_data():
     dcou = str(uuid.uuid4())
 
     # Create default GPOs
-    db.create_default_gpos(session, domain_settings.domain, ddp, ddcp)
+    db.create_default_gpos(graph, domain_settings.domain, ddp, ddcp)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:GPO) RETURN n"):
         result.append(r)
@@ -251,33 +260,36 @@ def test_generate_data():
     default_gpos = len(result)
 
     # Create dcs OUs
-    db.create_dcs_ous(session, domain_settings.domain, dcou)
+    db.create_dcs_ous(graph, domain_settings.domain, dcou)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:OU) RETURN n"):
         result.append(r)
     assert len(result) != 0
 
     # Add standard edges
-    db.add_standard_edges(session, domain_settings.domain, dcou)
+    db.add_standard_edges(graph, domain_settings.domain, dcou)
+    writer.write(graph)
     assert_standard_edges(session)
 
     # Create computers
-    computers_props, computers, ridcount = db.create_computers(session, domain_settings.domain, domain_settings.sid,
-                                                               domain_settings.nodes, computers, pool.clients_os,
-                                                               db.fixed_generation)
+    computers, ridcount = db.create_computers(graph, domain_settings.domain, domain_settings.sid,
+                                              domain_settings.nodes, computers, pool.clients_os,
+                                              db.fixed_generation)
     assert len(computers) == domain_settings.nodes
 
     # Create domain controllers
-    dcs_props, ridcount = db.create_dcs(session, domain_settings.domain, domain_settings.sid, dcou, ridcount,
+    dcs_props, ridcount = db.create_dcs(graph, domain_settings.domain, domain_settings.sid, dcou, ridcount,
                                         pool.servers_os, pool.ous)
     assert len(dcs_props) != 0
 
     # Create users
-    user_props, users, ridcount = db.create_users(session, domain_settings.domain, domain_settings.sid,
-                                                  domain_settings.nodes, domain_settings.current_time, pool.first_names,
-                                                  pool.last_names, users, ridcount)
+    users, ridcount = db.create_users(graph, domain_settings.domain, domain_settings.sid,
+                                      domain_settings.nodes, domain_settings.current_time, pool.first_names,
+                                      pool.last_names, users, ridcount)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:User) RETURN n"):
         result.append(r)
@@ -285,112 +297,117 @@ def test_generate_data():
     assert len(result) == len(users)
 
     # Create groups
-    groups_props, groups, ridcount = db.create_groups(session, domain_settings.domain, domain_settings.sid,
-                                                      domain_settings.nodes, groups, ridcount, pool.groups,
-                                                      db.fixed_generation)
+    groups, dept_groups, ridcount = db.create_groups(graph, domain_settings.domain, domain_settings.sid,
+                                                     domain_settings.nodes, groups, ridcount, pool.groups,
+                                                     db.fixed_generation)
     assert len(groups) == domain_settings.nodes
 
     # Add domain admin
-    db.add_domain_admin_to_local_admin(session, domain_settings.sid)
+    db.add_domain_admin_to_local_admin(graph, domain_settings.sid, computers + [dc["name"] for dc in dcs_props])
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH p=()-[r:AdminTo]->() RETURN p"):
         result.append(r)
     assert len(result) != 0
 
-    das = db.add_domain_admins(session, domain_settings.domain, domain_settings.nodes, users)
+    das = db.add_domain_admins(graph, domain_settings.domain, domain_settings.nodes, users)
     assert len(das) != 0
 
     # Create nested groups
-    db.create_nested_groups(session, domain_settings.nodes, groups)
+    db.create_nested_groups(graph, domain_settings.nodes, dept_groups)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH p=()-[r:MemberOf]->() RETURN p"):
         result.append(r)
     assert len(result) != 0
 
     # Add users to group
-    it_users = db.add_users_to_group(session, domain_settings.nodes, users, groups, das, pool.groups)
+    it_users = db.add_users_to_group(graph, domain_settings.nodes, users, dept_groups, das, pool.groups)
     assert len(it_users) != 0
 
     # Add local admin rights
-    it_groups = db.add_local_admin_rights(session, groups, computers)
+    it_groups = db.add_local_admin_rights(graph, dept_groups, computers)
     assert len(it_groups) != 0
 
-    db.add_rdp_dcom_delegate(session, computers, it_users, it_groups)
+    db.add_rdp_dcom_delegate(graph, computers, it_users, it_groups)
+    writer.write(graph)
     assert_rdp_dcom_delegate(session)
 
     # Add sessions
-    db.add_sessions(session, domain_settings.nodes, computers, users, das)
+    db.add_sessions(graph, domain_settings.nodes, computers, users, das)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH p = () - [r:HasSession]->() RETURN p"):
         result.append(r)
     assert len(result) != 0
 
     # Add domain admin ACEs
-    user_props, users, ridcount = db.create_users(session, domain_settings.domain, domain_settings.sid,
-                                                  domain_settings.nodes, domain_settings.current_time,
-                                                  pool.first_names, pool.last_names, users, ridcount)
+    users, ridcount = db.create_users(graph, domain_settings.domain, domain_settings.sid,
+                                      domain_settings.nodes, domain_settings.current_time,
+                                      pool.first_names, pool.last_names, users, ridcount)
 
-    db.add_domain_admin_aces(session, domain_settings.domain, computers, users, groups)
+    db.add_domain_admin_aces(graph, domain_settings.domain, computers, users, groups)
 
     # Creating OUs
-    ou_props, ou_guid_map = db.create_computers_ous(session, domain_settings.domain, computers, ou_guid_map, ou_props,
+    ou_props, ou_guid_map = db.create_computers_ous(graph, domain_settings.domain, computers, ou_guid_map, ou_props,
                                                     domain_settings.nodes, pool.ous)
 
-    ou_props, ou_guid_map = db.create_users_ous(session, domain_settings.domain, users, ou_guid_map, ou_props,
+    ou_props, ou_guid_map = db.create_users_ous(graph, domain_settings.domain, users, ou_guid_map, ou_props,
                                                 domain_settings.nodes, pool.ous)
 
     assert len(ou_props) == 2 * domain_settings.nodes
 
     # Link OUs to domain
-    db.link_ous_to_domain(session, domain_settings.domain, ou_guid_map)
+    db.link_ous_to_domain(graph, domain_settings.domain, ou_guid_map)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:Domain) WITH n MATCH (m:OU) WITH m MATCH p=()-[r:Contains]->() RETURN m"):
         result.append(r)
     assert len(result) != 0
 
     # Create GPOs
-    gpos = db.create_gpos(session, domain_settings.domain, gpos)
+    gpos = db.create_gpos(graph, domain_settings.domain, gpos)
     assert len(gpos) != 0
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:GPO) RETURN n"):
         result.append(r)
     assert len(result) == len(gpos) + default_gpos
 
-    db.link_to_ous(session, gpos, domain_settings.domain, ou_guid_map)
+    db.link_to_ous(graph, gpos, domain_settings.domain, ou_guid_map)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n:OU) WITH n MATCH (m:GPO) WITH n,m MATCH (m)-[:GpLink]->(n) return m"):
         result.append(r)
     assert len(result) != 0
 
     # Add outbound ACLs
-    db.add_outbound_acls(session, it_groups, it_users, gpos, computers, pool.acls, db.fixed_generation)
+    db.add_outbound_acls(graph, it_groups, it_users, gpos, computers, pool.acls, db.fixed_generation)
 
     # Add kerberoastable users
-    db.add_kerberoastable_users(session, it_users)
+    db.add_kerberoastable_users(graph, it_users)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n) WHERE (n.hasspn) RETURN n"):
         result.append(r)
     assert len(result) != 0
 
     # Add uncontrained delegation
-    db.add_unconstrained_delegation(session, computers)
+    db.add_unconstrained_delegation(graph, computers)
 
+    writer.write(graph)
     result = []
     for r in session.run("MATCH (n) WHERE (n.unconstrainteddelegation) RETURN n"):
         result.append(r)
     assert len(result) != 0
 
-    session.run("MATCH (n:User) SET n.owned=false")
-    session.run("MATCH (n:Computer) SET n.owned=false")
-    session.run("MATCH (n) SET n.domain=$domain", domain=domain_settings.domain)
-
     result = []
     for r in session.run("MATCH (n:User) WHERE n.owned=false RETURN n"):
         result.append(r)
@@ -402,3 +419,41 @@ def test_generate_data():
     assert len(result) != 0
 
     session.close()
+
+
+def test_generate_domain_seed():
+    """Test if the same seed generates the same domain"""
+    db_settings, domain_settings, pool = init_entity()
+    domain_settings.seed = 42
+
+    first = db.generate_domain(domain_settings, pool)
+    second = db.generate_domain(domain_settings, pool)
+    assert first.nodes == second.nodes
+    assert first.edges == second.edges
+
+    domain_settings.seed = 43
+    third = db.generate_domain(domain_settings, pool)
+    assert first.nodes != third.nodes
+
+
+def test_generate_forest():
+    """Test if the domains of a forest are generated in the same graph, each one with its own nodes"""
+    db_settings, domain_settings, pool = init_entity()
+    domain_settings.seed = 42
+    domain_settings.domains = 3
+
+    forest = db.create_forest(domain_settings)
+    assert [settings.domain for settings in forest] == ["TESTLAB.LOCAL", "CHILD01.TESTLAB.LOCAL",
+                                                        "CHILD02.TESTLAB.LOCAL"]
+    assert len(set(settings.sid for settings in forest)) == 3
+
+    graph = DomainGraph()
+    for settings in forest:
+        db.generate_domain(settings, pool, graph)
+    db.add_trusts(graph, forest[0].sid, [settings.sid for settings in forest[1:]])
+
+    assert len(graph.nodes["Domain"]) == 3
+    assert len(graph.edges["TrustedBy"]) == 4
+    for table in graph.nodes.values():
+        for props in table.values():
+            assert props["name"].endswith(props["domain"])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import pytest
+
+from adgen.entities.domain_graph import DomainGraph
+
+
+def test_domain_graph():
+    """Test if nodes and relationships are added to the graph"""
+    graph = DomainGraph()
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-512", "props": {"name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"name": "USER@TESTLAB.LOCAL"}}])
+
+    # Merging a node again updates its properties
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"enabled": True}}])
+    assert graph.nodes["User"]["S-1-5-21-1000"] == {"name": "USER@TESTLAB.LOCAL", "enabled": True}
+    assert graph.count_nodes() == 2
+
+    # Endpoints are resolved to the nodes, either by name or by objectid
+    graph.merge_edges("MemberOf", ("User", "name"), ("Group", "objectid"),
+                      [{"a": "USER@TESTLAB.LOCAL", "b": "S-1-5-21-512"}])
+    assert graph.edges["MemberOf"] == [("S-1-5-21-1000", "S-1-5-21-512", {})]
+    assert graph.count_edges() == 1
+
+    graph.set_properties("User", "name", ["USER@TESTLAB.LOCAL"], {"hasspn": True})
+    assert graph.nodes["User"]["S-1-5-21-1000"]["hasspn"] is True
+
+    # A relationship to a node which does not exist cannot be added
+    with pytest.raises(Exception):
+        graph.merge_edges("MemberOf", ("User", "name"), ("Group", "name"),
+                          [{"a": "USER@TESTLAB.LOCAL", "b": "MISSING@TESTLAB.LOCAL"}])
+
+
+def test_domain_graph_ids():
+    """Test if the nodes are given dense ids, which relationships can be added between"""
+    graph = DomainGraph()
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-512", "props": {"name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"name": "USER1@TESTLAB.LOCAL"}},
+                               {"id": "S-1-5-21-1001", "props": {"name": "USER2@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"enabled": True}}])
+
+    assert graph.objectids == ["S-1-5-21-512", "S-1-5-21-1000", "S-1-5-21-1001"]
+    assert graph.resolve_all(("User", "name"), ["USER2@TESTLAB.LOCAL", "USER1@TESTLAB.LOCAL"]) == [2, 1]
+    assert graph.resolve_all(("Group", "objectid"), ["S-1-5-21-512"]) == [0]
+
+    graph.add_edges("MemberOf", [(1, 0), (2, 0)])
+    graph.add_edges("MemberOf", [(1, 0)], {"isacl": False})
+    assert len(graph.edges["MemberOf"]) == 3
+    assert list(graph.edges["MemberOf"].ids()) == [(1, 0, {}), (2, 0, {}), (1, 0, {"isacl": False})]
+    assert list(graph.unique_edges("MemberOf")) == [("S-1-5-21-1000", "S-1-5-21-512", {"isacl": False}),
+                                                    ("S-1-5-21-1001", "S-1-5-21-512", {})]
+    assert graph.duplicates == {"MemberOf": 1}
+
+    with pytest.raises(Exception):
+        graph.resolve_all(("User", "name"), ["USER1@TESTLAB.LOCAL", "MISSING@TESTLAB.LOCAL"])
+
+
+class RecordingListener:
+    """A listener which records the changes of a graph"""
+
+    def __init__(self):
+        self.changes = []
+
+    def nodes(self, label, rows):
+        self.changes.append(("nodes", label, rows))
+
+    def edges(self, rel_type, rows):
+        self.changes.append(("edges", rel_type, rows))
+
+
+def test_domain_graph_streaming():
+    """Test if a graph which does not retain its content passes every change to its listener"""
+    listener = RecordingListener()
+    graph = DomainGraph(listener=listener, retain=False)
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-512", "props": {"name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"name": "USER@TESTLAB.LOCAL"}}])
+    graph.merge_edges("MemberOf", ("User", "name"), ("Group", "name"),
+                      [{"a": "USER@TESTLAB.LOCAL", "b": "DOMAIN ADMINS@TESTLAB.LOCAL"}])
+    graph.set_properties("User", "name", ["USER@TESTLAB.LOCAL"], {"owned": False})
+
+    # Only the index used to resolve the relationships is kept
+    assert graph.count_nodes() == 2
+    assert graph.count_edges() == 1
+    assert graph.nodes["User"] == {}
+    assert graph.edges == {}
+
+    assert listener.changes[2] == ("edges", "MemberOf", [{"a": "S-1-5-21-1000", "b": "S-1-5-21-512", "props": {}}])
+    assert listener.changes[3] == ("nodes", "User", [{"id": "S-1-5-21-1000", "props": {"owned": False}}])
+
+
+def test_domain_graph_stamps():
+    """Test if the stamped properties are only set on the nodes added afterwards"""
+    listener = RecordingListener()
+    graph = DomainGraph(listener=listener)
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"name": "USER@TESTLAB.LOCAL"}}])
+
+    graph.stamp(None, {"domain": "TESTLAB.LOCAL"})
+    graph.stamp("User", {"owned": False})
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"enabled": True}},
+                               {"id": "S-1-5-21-1001", "props": {"name": "OWNED@TESTLAB.LOCAL", "owned": True}}])
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-512", "props": {"name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+
+    assert graph.nodes["User"]["S-1-5-21-1000"] == {"name": "USER@TESTLAB.LOCAL", "enabled": True}
+    assert graph.nodes["User"]["S-1-5-21-1001"] == {"name": "OWNED@TESTLAB.LOCAL", "owned": True,
+                                                    "domain": "TESTLAB.LOCAL"}
+    assert graph.nodes["Group"]["S-1-5-21-512"] == {"name": "DOMAIN ADMINS@TESTLAB.LOCAL", "domain": "TESTLAB.LOCAL"}
+
+    # The stamped properties are sent with the nodes, not by a later update
+    assert listener.changes[2] == ("nodes", "Group", [{"id": "S-1-5-21-512",
+                                                       "props": {"domain": "TESTLAB.LOCAL",
+                                                                 "name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+    assert len(listener.changes) == 3
+
+
+def test_domain_graph_stamps_forest():
+    """Test if the stamps of a domain of a forest leave the nodes of the domains added before untouched"""
+    graph = DomainGraph()
+    graph.stamp(None, {"domain": "TESTLAB.LOCAL"})
+    graph.stamp("Group", {"highvalue": True})
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-512", "props": {"name": "DOMAIN ADMINS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"name": "USER@TESTLAB.LOCAL"}}])
+
+    # Only the nodes with the stamped label are stamped with its properties
+    assert graph.nodes["Group"]["S-1-5-21-512"]["highvalue"] is True
+    assert "highvalue" not in graph.nodes["User"]["S-1-5-21-1000"]
+
+    graph.stamp(None, {"domain": "CHILD01.TESTLAB.LOCAL"})
+    graph.merge_nodes("User", [{"id": "S-1-5-21-2000", "props": {"name": "USER@CHILD01.TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [{"id": "S-1-5-21-1000", "props": {"enabled": True}}])
+
+    assert graph.nodes["User"]["S-1-5-21-1000"]["domain"] == "TESTLAB.LOCAL"
+    assert graph.nodes["User"]["S-1-5-21-2000"]["domain"] == "CHILD01.TESTLAB.LOCAL"
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import random
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.entities.weighted_list import WeightedList
+from adgen.generators import acls as acls_module
+from adgen.generators.acls import DOMAIN_ACES, add_domain_aces, add_outbound_acls
+from adgen.generators.groups import WELL_KNOWN_GROUPS, data_generation
+
+
+def test_domain_aces():
+    """Test if the well-known groups and their ACEs on the domain are created"""
+    graph = DomainGraph()
+    data_generation(graph, "TESTLAB.LOCAL", "S-1-5-21-883232822-274137685-4173207997")
+    add_domain_aces(graph, "TESTLAB.LOCAL")
+
+    assert len(graph.nodes["Group"]) == len(WELL_KNOWN_GROUPS)
+    assert graph.nodes["Group"]["S-1-5-21-883232822-274137685-4173207997-512"] == {
+        "name": "DOMAIN ADMINS@TESTLAB.LOCAL", "highvalue": True
+    }
+    assert "S-1-5-9-S-1-5-21-883232822-274137685-4173207997" in graph.nodes["Group"]
+
+    # Every ACE ends on the domain, and each type is added at once
+    assert graph.count_edges() == sum(len(aces) for group, aces in DOMAIN_ACES)
+    assert len(graph.edges["GetChanges"]) == 4
+    for edges in graph.edges.values():
+        for a, b, props in edges:
+            assert b == "S-1-5-21-883232822-274137685-4173207997"
+            assert props == {"isacl": True}
+
+
+def init_acl_graph():
+    """Build a graph with 20 groups, 5 users, a GPO and a computer"""
+    graph = DomainGraph()
+    groups = ["GROUP{}".format(i) for i in range(20)]
+    users = ["USER{}".format(i) for i in range(5)]
+    graph.merge_nodes("Group", [{"id": "G{}".format(i), "props": {"name": name}} for i, name in enumerate(groups)])
+    graph.merge_nodes("User", [{"id": "U{}".format(i), "props": {"name": name}} for i, name in enumerate(users)])
+    graph.merge_nodes("GPO", [{"id": "GPO0", "props": {"name": "GPO0"}}])
+    graph.merge_nodes("Computer", [{"id": "C0", "props": {"name": "COMP0"}}])
+    return graph, groups, users
+
+
+def test_outbound_acls_fixed_generation():
+    """Test if a fixed generation gives each ACE exactly its share of the ACEs of each group"""
+    graph, groups, users = init_acl_graph()
+    acls = WeightedList(["AddMember", "ForceChangePassword"], [30, 70])
+    add_outbound_acls(graph, groups, users, ["GPO0"], ["COMP0"], acls, True, random.Random(1))
+
+    # 2 groups, each one with 20 ACEs, 30% of which are AddMember
+    assert len(graph.edges["AddMember"]) == 2 * 6
+    assert len(graph.edges["ForceChangePassword"]) == 2 * 14
+
+
+def test_outbound_acls_random(monkeypatch):
+    """Test if the ACEs are drawn without computing the quotas of a fixed generation"""
+    def fail(*args):
+        raise AssertionError("quotas computed")
+
+    monkeypatch.setattr(acls_module, "allocate_quotas", fail)
+    graph, groups, users = init_acl_graph()
+    add_outbound_acls(graph, groups, users, ["GPO0"], ["COMP0"], WeightedList(["AddMember"], [100]), False,
+                      random.Random(1))
+
+    assert len(graph.edges["AddMember"]) == 2 * 20
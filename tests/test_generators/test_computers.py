@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.entities.weighted_list import WeightedList
+from adgen.generators.acls import add_standard_edges
+from adgen.generators.computers import add_sessions, create_dcs
+from adgen.generators.gpos import create_default_gpos
+from adgen.generators.groups import data_generation
+from adgen.generators.ous import create_dcs_ous
+
+
+def test_add_sessions():
+    """Test if every domain admin has a session, on distinct computers"""
+    graph = DomainGraph()
+    graph.merge_nodes("Computer", [{"id": "C{}".format(i), "props": {"name": "COMP{}".format(i)}} for i in range(50)])
+    graph.merge_nodes("User", [{"id": "U{}".format(i), "props": {"name": "USER{}".format(i)}} for i in range(100)])
+    users = ["USER{}".format(i) for i in range(100)]
+    das = users[:10]
+
+    add_sessions(graph, 100, ["COMP{}".format(i) for i in range(50)], users, das)
+
+    sessions = graph.edges["HasSession"]
+    assert all(a.startswith("C") and b.startswith("U") for a, b, props in sessions)
+    assert len(set((a, b) for a, b, props in sessions)) == len(sessions)
+    assert {"U{}".format(i) for i in range(10)} <= {b for a, b, props in sessions}
+
+
+def test_create_dcs():
+    """Test if the domain controllers are members of the DOMAIN CONTROLLERS group, not of the OU with its name"""
+    sid = "S-1-5-21-1"
+    graph = DomainGraph()
+    data_generation(graph, "TESTLAB.LOCAL", sid)
+    create_default_gpos(graph, "TESTLAB.LOCAL", "DDP", "DDCP")
+    create_dcs_ous(graph, "TESTLAB.LOCAL", "DCOU")
+    add_standard_edges(graph, "TESTLAB.LOCAL", "DCOU")
+
+    dcs, ridcount = create_dcs(graph, "TESTLAB.LOCAL", sid, "DCOU", 1000, WeightedList(["Windows Server 2019"], [100]),
+                               ["WA", "AL"])
+
+    dc_ids = {dc["id"] for dc in dcs}
+    member_of = [(a, b) for a, b, props in graph.edges["MemberOf"] if a in dc_ids]
+    assert ("S-1-5-21-1-1000", "S-1-5-21-1-516") in member_of
+    assert "DCOU" not in {b for a, b in member_of}
+    assert ("S-1-5-21-1-516", sid) in [(a, b) for a, b, props in graph.edges["GetChangesAll"]]
+    assert "DCOU" not in {a for a, b, props in graph.edges["GetChangesAll"]}
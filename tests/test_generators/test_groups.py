@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.entities.weighted_list import WeightedList
+from adgen.generators.groups import create_groups, create_nested_groups, data_generation
+
+
+def test_create_groups():
+    """Test if the groups are indexed by department"""
+    graph = DomainGraph()
+    groups, dept_groups, ridcount = create_groups(graph, "CITY.LOCAL", "S-1-5-21", 1000, [], 2000,
+                                                  WeightedList(["IT", "HR", "MARKETING"], [1, 2, 1]), False)
+
+    assert ridcount == 3000
+    assert sorted(g for dept in dept_groups.values() for g in dept) == sorted(groups)
+    # The domain name contains 'IT', but only the IT groups are indexed under it
+    assert all(g.startswith("IT") for g in dept_groups["IT"])
+    assert all(g.startswith("HR") for g in dept_groups["HR"])
+
+
+def test_create_nested_groups():
+    """Test if groups are only nested within their department"""
+    graph = DomainGraph()
+    data_generation(graph, "CITY.LOCAL", "S-1-5-21")
+    groups, dept_groups, ridcount = create_groups(graph, "CITY.LOCAL", "S-1-5-21", 1000, [], 2000,
+                                                  WeightedList(["IT", "HR", "MARKETING"], [1, 1, 1]), False)
+    create_nested_groups(graph, 1000, dept_groups)
+
+    names = {objectid: props["name"] for objectid, props in graph.nodes["Group"].items()}
+    assert len(graph.edges["MemberOf"]) != 0
+    for a, b, props in graph.edges["MemberOf"]:
+        assert names[a].split("0")[0] == names[b].split("0")[0]
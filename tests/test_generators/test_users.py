@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+from adgen.entities.domain_graph import DomainGraph
+from adgen.generators.groups import data_generation
+from adgen.generators.users import create_users, generate_users, set_name_pools
+
+
+def test_generate_users():
+    """Test if the users are generated in batches of bounded size"""
+    batches = list(generate_users("TESTLAB.LOCAL", "S-1-5-21", 5, 1600000000, ["JOHN"], ["DOE"], 1000, batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0]["id"] == "S-1-5-21-1000"
+    assert batches[2][0]["props"]["name"] == "JDOE00005@TESTLAB.LOCAL"
+    assert batches[2][0]["props"]["displayname"] == "JOHN DOE"
+
+
+def test_generate_users_timestamps():
+    """Test if the timestamps are -1, 0 or within the year before the current time"""
+    users = [user for batch in generate_users("TESTLAB.LOCAL", "S-1-5-21", 3000, 1600000000, ["JOHN"], ["DOE"], 1000)
+             for user in batch]
+    timestamps = [user["props"][key] for user in users for key in ("pwdlastset", "lastlogon")]
+
+    assert all(t in (-1, 0) or 1600000000 - 31536000 <= t <= 1600000000 for t in timestamps)
+    # Each kind of value is drawn about a third of the times
+    assert 1500 < timestamps.count(-1) < 2500
+    assert 1500 < timestamps.count(0) < 2500
+
+
+def test_create_users():
+    """Test if only the names of the users are returned"""
+    graph = DomainGraph()
+    data_generation(graph, "TESTLAB.LOCAL", "S-1-5-21")
+    users, ridcount = create_users(graph, "TESTLAB.LOCAL", "S-1-5-21", 5, 1600000000, ["JOHN"], ["DOE"], [], 1000)
+
+    assert users == ["JDOE0000{}@TESTLAB.LOCAL".format(i) for i in range(1, 6)]
+    assert ridcount == 1005
+    assert len(graph.nodes["User"]) == 5
+    assert len(graph.edges["MemberOf"]) == 5
+
+
+def test_create_users_sharded():
+    """Test if the users do not depend on the processes generating their shards"""
+    graphs = []
+    names = (["JOHN", "JANE"], ["DOE", "ROE"])
+    for executor in (None, ProcessPoolExecutor(2, initializer=set_name_pools, initargs=names)):
+        graph = DomainGraph()
+        data_generation(graph, "TESTLAB.LOCAL", "S-1-5-21")
+        users, ridcount = create_users(graph, "TESTLAB.LOCAL", "S-1-5-21", 45000, 1600000000, *names, [], 1000,
+                                       random.Random(1), executor)
+        graphs.append(graph)
+        if executor is not None:
+            executor.shutdown()
+        assert ridcount == 46000
+        assert len(set(users)) == 45000
+
+    assert graphs[0].nodes == graphs[1].nodes
+    assert graphs[0].edges == graphs[1].edges
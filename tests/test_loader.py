@@ -5,7 +5,7 @@
 # See /LICENSE for licensing information.
 
 import os
-from adgen.utils.loader import check_ini_file
+from adgen.utils.loader import LazyPool, check_ini_file, get_list_from_ini, read_ini
 
 
 def test_parameters():
@@ -34,3 +34,30 @@ def test_parameters():
     path_to_check = os.path.join(os.path.abspath('tests'), 'data', 'negative_prob.ini')
     check = check_ini_file(path_to_check)
     assert check == -2
+
+
+def test_lazy_pool():
+    """Test if each value of the pool is only loaded once, when it is first used"""
+    loaded = []
+    pool = LazyPool({"a": lambda: loaded.append("a") or [1], "b": lambda: loaded.append("b") or [2]})
+    assert loaded == []
+    assert sorted(pool) == ["a", "b"]
+
+    assert pool.get("a") == [1]
+    assert pool["a"] == [1]
+    assert loaded == ["a"]
+
+
+def test_read_ini(tmp_path):
+    """Test if a .ini file is only parsed again once it has been modified"""
+    path = os.path.join(str(tmp_path), "pool.ini")
+    with open(path, "w") as fh:
+        fh.write("[OUS]\nIT = 2\n")
+
+    assert read_ini(path) is read_ini(path)
+    assert get_list_from_ini("OUS", path).weights == [2]
+
+    with open(path, "w") as fh:
+        fh.write("[OUS]\nHR = 1\n")
+    os.utime(path, ns=(0, 0))
+    assert list(get_list_from_ini("OUS", path)) == ["HR"]
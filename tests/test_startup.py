@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# The seconds adgen may take to import and handle its arguments before exiting
+STARTUP_BUDGET = 0.5
+
+# The modules only needed by the commands which generate data
+HEAVY_MODULES = ["neo4j", "yaml", "asyncio", "adgen.db", "adgen.initializer", "adgen.generators.users"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.argv = ["adgen"] + {argv!r}
+from adgen.main import main
+try:
+    main()
+except SystemExit:
+    pass
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+EXPORT_SCRIPT = """
+import json, sys
+from adgen.commands.run_mode import run
+from adgen.db import export_data
+print(json.dumps(sorted(name for name in sys.modules if name.split(".")[0] == "neo4j")))
+"""
+
+
+def run_python(script):
+    """Runs a script in a fresh interpreter, returning the JSON report it prints last"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+    # The last line is the report, after the output of adgen
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_adgen(argv):
+    """Runs adgen in a fresh interpreter, returning its startup time and the heavy modules it imported"""
+    return run_python(STARTUP_SCRIPT.format(argv=argv, heavy=HEAVY_MODULES))
+
+
+@pytest.mark.parametrize("argv", [
+    ["--help"],
+    ["run", "--help"],
+    ["run", "--domain", "TESTLAB.LOCAL", "--export-json", "out.json"],
+    ["run", "--nodes-val", "100", "--domain", "TESTLAB.LOCAL"],
+    ["config", "--conn", "missing.ini", "--param", "missing.ini"],
+])
+def test_startup(argv):
+    """Test if help and invalid arguments are handled quickly, without importing the heavy modules"""
+    report = run_adgen(argv)
+    assert report["heavy"] == []
+    assert report["seconds"] < STARTUP_BUDGET
+
+
+def test_export_imports():
+    """Test if the commands exporting to files never import the driver"""
+    assert run_python(EXPORT_SCRIPT) == []
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+from adgen.entities.weighted_list import WeightedList
+from adgen.utils.support_functions import allocate_quotas, assign_quotas
+
+
+def test_allocate_quotas():
+    """Test if the nodes are split exactly, the nodes left going to the largest remainders"""
+    weighted = WeightedList(["A", "B", "C"], [50, 30, 20])
+    assert allocate_quotas(1000, weighted) == [500, 300, 200]
+    # The exact shares are 3.5, 2.1 and 1.4
+    assert allocate_quotas(7, weighted) == [4, 2, 1]
+    assert allocate_quotas(0, weighted) == [0, 0, 0]
+
+    # The weights do not need to sum to 100
+    assert sum(allocate_quotas(10000001, WeightedList(["A", "B", "C"], [1, 1, 1]))) == 10000001
+    assert allocate_quotas(3, WeightedList(["A", "B"], [0.5, 99.5])) == [0, 3]
+
+
+def test_assign_quotas():
+    """Test if the options of any range of nodes are assigned in order, following their counts"""
+    options = ["A", "B", "C"]
+    counts = [2, 3, 1]
+    assert assign_quotas(options, counts, 0, 6) == ["A", "A", "B", "B", "B", "C"]
+    assert assign_quotas(options, counts, 1, 3) == ["A", "B", "B"]
+    assert assign_quotas(options, counts, 5, 1) == ["C"]
+
+    # Shards assigned separately give the whole generation
+    shards = [assign_quotas(options, counts, offset, 2) for offset in range(0, 6, 2)]
+    assert sum(shards, []) == assign_quotas(options, counts, 0, 6)
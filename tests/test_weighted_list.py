@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import os
+import random
+
+from adgen.entities.weighted_list import WeightedList
+from adgen.utils.loader import get_list_from_ini
+
+
+def test_weighted_list():
+    """Test if the options are drawn with a probability proportional to their weights"""
+    weighted = WeightedList(["A", "B", "C"], [0.5, 0, 99.5])
+    rng = random.Random(1)
+
+    drawn = weighted.sample(10000, rng) + [weighted.choice(rng) for i in range(10000)]
+    assert "B" not in drawn
+    assert 20 < drawn.count("A") < 200
+    assert list(weighted) == ["A", "B", "C"]
+    assert len(weighted) == 3
+
+
+def test_weighted_list_from_ini(tmp_path):
+    """Test if each option of a section is stored once, with its weight"""
+    path = os.path.join(str(tmp_path), "pool.ini")
+    with open(path, "w") as fh:
+        fh.write("[CLIENTS]\nWindows 10 Pro = 60\nWindows 7 Ultimate = 39.5\nWindows XP Professional = 0.5\n")
+
+    clients = get_list_from_ini("CLIENTS", path)
+    assert clients.options == ["Windows 10 Pro", "Windows 7 Ultimate", "Windows XP Professional"]
+    assert clients.weights == [60, 39.5, 0.5]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import asyncio
+import pytest
+
+from adgen.writers.async_writer import AsyncNeo4jWriter
+
+
+class AsyncResult:
+    """The result of a statement run by an AsyncRecordingSession"""
+
+    async def consume(self):
+        pass
+
+
+class AsyncRecordingSession:
+    """An async session which records the statements instead of running them"""
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def run(self, statement, **params):
+        self.statements.append((" ".join(statement.split()), params))
+        return AsyncResult()
+
+
+class AsyncRecordingDriver:
+    """An async driver whose sessions record the statements they run"""
+
+    def __init__(self):
+        self.statements = []
+
+    def session(self):
+        return AsyncRecordingSession(self.statements)
+
+
+def generate(graph):
+    """Add a group with five members to the graph"""
+    graph.stamp(None, {"domain": "TESTLAB.LOCAL"})
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-513", "props": {"name": "DOMAIN USERS@TESTLAB.LOCAL"}}])
+    for i in range(5):
+        graph.merge_nodes("User", [{"id": "S-1-5-21-100{}".format(i), "props": {"name": "USER{}".format(i)}}])
+        graph.merge_edges("MemberOf", ("User", "objectid"), ("Group", "objectid"),
+                          [{"a": "S-1-5-21-100{}".format(i), "b": "S-1-5-21-513"}])
+    graph.set_properties("User", "name", ["USER{}".format(i) for i in range(5)], {"hasspn": True})
+
+
+def test_async_write():
+    """Test if the batches are written while the graph is generated, nodes before their relationships"""
+    driver = AsyncRecordingDriver()
+    writer = AsyncNeo4jWriter(driver, batch_size=2, queue_size=1)
+    graph = asyncio.run(writer.write(generate))
+
+    assert graph.count_nodes() == 6
+    assert graph.count_edges() == 5
+
+    written = set()
+    edges = 0
+    for statement, params in driver.statements:
+        assert len(params["props"]) <= 2
+        if "MERGE (n)-[r:MemberOf]->(m)" in statement:
+            for row in params["props"]:
+                assert row["a"] in written and row["b"] in written
+                edges += 1
+        else:
+            written.update(row["id"] for row in params["props"])
+    assert edges == 5
+
+    # The stamped properties are written with the nodes, and the final updates too
+    rows = [row for s, p in driver.statements for row in p["props"] if "id" in row]
+    assert sum(row["props"].get("domain") == "TESTLAB.LOCAL" for row in rows) == 6
+    assert sum(row["props"] == {"hasspn": True} for row in rows) == 5
+    assert writer.report()["MemberOf"][:2] == (3, 5)
+
+
+def test_async_write_error():
+    """Test if an error raised while generating is not lost"""
+    def fail(graph):
+        generate(graph)
+        raise Exception("ERROR: generation failed")
+
+    with pytest.raises(Exception, match="generation failed"):
+        asyncio.run(AsyncNeo4jWriter(AsyncRecordingDriver(), batch_size=2, queue_size=1).write(fail))
+
+
+class AsyncFailingDriver(AsyncRecordingDriver):
+    """An async driver whose statements fail"""
+
+    def session(self):
+        session = AsyncRecordingSession(self.statements)
+
+        async def run(statement, **params):
+            raise Exception("ERROR: write failed")
+
+        session.run = run
+        return session
+
+
+def test_async_write_failure():
+    """Test if a failed write stops the generation instead of blocking it"""
+    with pytest.raises(Exception, match="write failed"):
+        asyncio.run(AsyncNeo4jWriter(AsyncFailingDriver(), batch_size=1, queue_size=1).write(generate))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import pytest
+
+from adgen.writers import batch_writer
+from adgen.writers.batch_writer import BatchWriter
+from neo4j.exceptions import TransientError
+from unittest import mock
+
+
+class FlakySession:
+    """A session whose statements fail with a transient error a few times"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.batches = []
+        self.transactions = 0
+
+    def run(self, statement, **params):
+        if self.failures > 0:
+            self.failures -= 1
+            raise TransientError("deadlock")
+        self.batches.append(params["props"])
+        return mock.Mock()
+
+    def execute_write(self, work, *args):
+        self.transactions += 1
+        return work(self, *args)
+
+
+def test_batch_writer():
+    """Test if the rows are sent in batches of bounded size, and timed"""
+    session = FlakySession(failures=0)
+    writer = BatchWriter(session, batch_size=2)
+    writer.write("UNWIND $props AS prop CREATE (n:Base)", [1, 2, 3, 4, 5], "User")
+
+    assert session.batches == [[1, 2], [3, 4], [5]]
+    assert session.transactions == 0
+    assert [rows for name, rows, seconds in writer.timings] == [2, 2, 1]
+    assert writer.report()["User"][:2] == (3, 5)
+
+
+def test_batch_writer_transactions():
+    """Test if each batch runs in an explicit write transaction"""
+    session = FlakySession(failures=0)
+    writer = BatchWriter(session, batch_size=2, transactions=True)
+    writer.write("UNWIND $props AS prop CREATE (n:Base)", [1, 2, 3])
+
+    assert session.batches == [[1, 2], [3]]
+    assert session.transactions == 2
+
+
+def test_batch_writer_retry(monkeypatch):
+    """Test if a batch is run again after a transient error"""
+    monkeypatch.setattr(batch_writer, "RETRY_DELAY", 0)
+
+    session = FlakySession(failures=2)
+    BatchWriter(session, retries=2).write("UNWIND $props AS prop CREATE (n:Base)", [1])
+    assert session.batches == [[1]]
+
+    session = FlakySession(failures=3)
+    with pytest.raises(TransientError):
+        BatchWriter(session, retries=2).write("UNWIND $props AS prop CREATE (n:Base)", [1])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import csv
+import os
+import adgen.db as db
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.initializer import initialize
+from adgen.writers.csv_writer import CsvWriter
+
+
+def read_csv(path):
+    """Read a CSV file as a list of rows"""
+    with open(path, newline="") as fh:
+        return list(csv.reader(fh))
+
+
+def test_csv_writer(tmp_path):
+    """Test the files written by the CSV writer"""
+    graph = DomainGraph()
+    graph.stamp(None, {"domain": "TESTLAB.LOCAL"})
+    graph.merge_nodes("User", [
+        {"id": "S-1-5-21-1", "props": {"name": "USER1@TESTLAB.LOCAL", "enabled": True, "pwdlastset": -1}},
+        {"id": "S-1-5-21-2", "props": {"name": "USER2@TESTLAB.LOCAL", "enabled": False, "pwdlastset": 0}}
+    ])
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-513", "props": {"name": "DOMAIN USERS@TESTLAB.LOCAL"}}])
+
+    # The same relationship is kept only once, as with a MERGE
+    graph.merge_edges("MemberOf", ("User", "objectid"), ("Group", "name"), [
+        {"a": "S-1-5-21-1", "b": "DOMAIN USERS@TESTLAB.LOCAL"},
+        {"a": "S-1-5-21-1", "b": "DOMAIN USERS@TESTLAB.LOCAL"}
+    ])
+    graph.set_properties("User", "name", ["USER2@TESTLAB.LOCAL"], {"hasspn": True})
+
+    node_files, rel_files = CsvWriter(str(tmp_path)).write(graph)
+    assert len(node_files) == 2
+    assert len(rel_files) == 1
+
+    users = read_csv(os.path.join(str(tmp_path), "nodes_User.csv"))
+    assert users[0] == ["objectid:ID", "domain", "name", "enabled:boolean", "pwdlastset:long", "hasspn:boolean",
+                        ":LABEL"]
+    assert users[1] == ["S-1-5-21-1", "TESTLAB.LOCAL", "USER1@TESTLAB.LOCAL", "true", "-1", "", "Base;User"]
+    assert users[2] == ["S-1-5-21-2", "TESTLAB.LOCAL", "USER2@TESTLAB.LOCAL", "false", "0", "true", "Base;User"]
+
+    member_of = read_csv(os.path.join(str(tmp_path), "rels_MemberOf.csv"))
+    assert member_of == [[":START_ID", ":END_ID", ":TYPE"], ["S-1-5-21-1", "S-1-5-21-513", "MemberOf"]]
+
+
+def test_csv_writer_shared_name(tmp_path):
+    """Test if a relationship ends at the node with the label of its endpoint when another one has the same name"""
+    graph = DomainGraph()
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-516", "props": {"name": "DOMAIN CONTROLLERS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("OU", [{"id": "DCOU", "props": {"name": "DOMAIN CONTROLLERS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("Computer", [{"id": "S-1-5-21-1000", "props": {"name": "DC01@TESTLAB.LOCAL"}}])
+    graph.merge_edges("MemberOf", ("Computer", "objectid"), ("Group", "name"), [
+        {"a": "S-1-5-21-1000", "b": "DOMAIN CONTROLLERS@TESTLAB.LOCAL"}
+    ])
+    graph.merge_edges("Contains", ("OU", "name"), ("Computer", "objectid"), [
+        {"a": "DOMAIN CONTROLLERS@TESTLAB.LOCAL", "b": "S-1-5-21-1000"}
+    ])
+
+    CsvWriter(str(tmp_path)).write(graph)
+
+    member_of = read_csv(os.path.join(str(tmp_path), "rels_MemberOf.csv"))
+    assert member_of[1:] == [["S-1-5-21-1000", "S-1-5-21-516", "MemberOf"]]
+    contains = read_csv(os.path.join(str(tmp_path), "rels_Contains.csv"))
+    assert contains[1:] == [["DCOU", "S-1-5-21-1000", "Contains"]]
+
+
+def test_export_csv(tmp_path):
+    """Test the export of a whole domain to CSV files"""
+    db_settings, domain_settings, pool = initialize({"command": "interactive"})
+    db.export_data(domain_settings, pool, csv_path=str(tmp_path))
+
+    node_ids = set()
+    for label in ["Domain", "User", "Computer", "Group", "OU", "GPO"]:
+        rows = read_csv(os.path.join(str(tmp_path), "nodes_{}.csv".format(label)))
+        assert len(rows) > 1
+        node_ids.update(row[0] for row in rows[1:])
+
+    users = read_csv(os.path.join(str(tmp_path), "nodes_User.csv"))
+    assert len(users) - 1 == domain_settings.nodes
+
+    # Every objectid is unique and every relationship refers to an exported node
+    assert len(node_ids) == sum(len(read_csv(os.path.join(str(tmp_path), f))) - 1
+                                for f in os.listdir(str(tmp_path)) if f.startswith("nodes_"))
+
+    for rel_type in ["MemberOf", "AdminTo", "HasSession", "Contains", "GpLink", "GenericAll"]:
+        rows = read_csv(os.path.join(str(tmp_path), "rels_{}.csv".format(rel_type)))
+        assert len(rows) > 1
+        for row in rows[1:]:
+            assert row[0] in node_ids
+            assert row[1] in node_ids
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+import json
+import os
+import adgen.db as db
+
+from adgen.initializer import initialize
+
+
+def test_export_json(tmp_path):
+    """Test the export of a whole domain to a JSON file"""
+    db_settings, domain_settings, pool = initialize({"command": "interactive"})
+    json_path = os.path.join(str(tmp_path), "domain.json")
+    db.export_data(domain_settings, pool, json_path=json_path)
+
+    with open(json_path) as fh:
+        data = json.load(fh)
+
+    users = [n for n in data["nodes"] if "User" in n["labels"]]
+    assert len(users) == domain_settings.nodes
+    assert all(n["properties"]["domain"] == domain_settings.domain for n in data["nodes"])
+
+    node_ids = set(n["objectid"] for n in data["nodes"])
+    assert len(node_ids) == len(data["nodes"])
+    assert len(data["relationships"]) != 0
+    for r in data["relationships"]:
+        assert r["start"] in node_ids
+        assert r["end"] in node_ids
+
+    # The duplicate relationships are dropped
+    keys = set((r["type"], r["start"], r["end"]) for r in data["relationships"])
+    assert len(keys) == len(data["relationships"])
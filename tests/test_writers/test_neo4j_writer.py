@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+# adgen test suite
+# Copyright © 2021, Lorenzo Mariani.
+# See /LICENSE for licensing information.
+
+from adgen.entities.domain_graph import DomainGraph
+from adgen.writers.neo4j_writer import Neo4jWriter, ParallelNeo4jWriter, SCHEMA, clear_database
+from unittest import mock
+
+
+class RecordingSession:
+    """A session which records the statements instead of running them"""
+
+    def __init__(self):
+        self.statements = []
+
+    def run(self, statement, **params):
+        self.statements.append((" ".join(statement.split()), params))
+        return mock.Mock()
+
+    def close(self):
+        pass
+
+
+def init_graph():
+    """Build a small graph with two users and one group"""
+    graph = DomainGraph()
+    graph.merge_nodes("Group", [{"id": "S-1-5-21-513", "props": {"name": "DOMAIN USERS@TESTLAB.LOCAL"}}])
+    graph.merge_nodes("User", [
+        {"id": "S-1-5-21-1000", "props": {"name": "USER1@TESTLAB.LOCAL"}},
+        {"id": "S-1-5-21-1001", "props": {"name": "USER2@TESTLAB.LOCAL"}}
+    ])
+    graph.merge_edges("MemberOf", ("User", "objectid"), ("Group", "objectid"), [
+        {"a": "S-1-5-21-1000", "b": "S-1-5-21-513"},
+        {"a": "S-1-5-21-1001", "b": "S-1-5-21-513"}
+    ])
+    return graph
+
+
+def test_write():
+    """Test if nodes are written before relationships, in batches"""
+    session = RecordingSession()
+    writer = Neo4jWriter(session, batch_size=1)
+    writer.write(init_graph())
+
+    statements = [s for s, p in session.statements]
+    assert len(statements) == 5
+    assert all(s.startswith("UNWIND $props AS prop MERGE (n:Base {objectid:prop.id})") for s in statements[:3])
+    assert all("MERGE (n)-[r:MemberOf]->(m)" in s for s in statements[3:])
+    # The nodes of the relationships are looked up, not merged again
+    assert all(s.startswith("UNWIND $props AS prop MATCH (n:Base {objectid:prop.a})") for s in statements[3:])
+    assert all(len(p["props"]) == 1 for s, p in session.statements)
+
+    # Each label and relationship type is timed
+    assert writer.report()["User"][:2] == (2, 2)
+    assert writer.report()["MemberOf"][:2] == (2, 2)
+
+
+def test_write_defer_schema():
+    """Test if the schema is set after the nodes when it is deferred"""
+    session = RecordingSession()
+    Neo4jWriter(session, defer_schema=True).write(init_graph())
+
+    statements = [s for s, p in session.statements]
+    assert statements[0].startswith("UNWIND $props AS prop CREATE (n:Base {objectid:prop.id})")
+    assert statements[1].startswith("UNWIND $props AS prop CREATE (n:Base {objectid:prop.id})")
+    assert statements[2:2 + len(SCHEMA)] == list(SCHEMA.values())
+    # The relationships of new nodes are created, not merged
+    assert "CREATE (n)-[r:MemberOf]->(m)" in statements[-1]
+
+
+class DeletingSession:
+    """A session which simulates the deletion of some entities"""
+
+    def __init__(self, relationships, nodes):
+        self.remaining = {"r": relationships, "n": nodes}
+        self.statements = 0
+
+    def run(self, statement, **params):
+        self.statements += 1
+        key = "r" if "DELETE r" in statement else "n"
+        deleted = min(params["batch"], self.remaining[key])
+        self.remaining[key] -= deleted
+        return mock.Mock(single=lambda: {"deleted": deleted})
+
+
+def test_clear_database():
+    """Test if the database is cleared in bounded batches"""
+    session = DeletingSession(relationships=25, nodes=10)
+    clear_database(session, batch_size=10)
+
+    assert session.remaining == {"r": 0, "n": 0}
+    # 3 batches of relationships and 2 of nodes (the last one finds nothing to delete)
+    assert session.statements == 5
+
+
+class RecordingDriver:
+    """A driver whose sessions record the statements they run in a shared list"""
+
+    def __init__(self):
+        self.statements = []
+
+    def session(self):
+        session = RecordingSession()
+        session.statements = self.statements
+        return session
+
+
+def test_parallel_write():
+    """Test if every batch is written once, nodes before relationships"""
+    driver = RecordingDriver()
+    graph = init_graph()
+    # The same relationship is only sent once
+    graph.merge_edges("MemberOf", ("User", "objectid"), ("Group", "objectid"),
+                      [{"a": "S-1-5-21-1000", "b": "S-1-5-21-513"}])
+
+    writer = ParallelNeo4jWriter(driver, workers=2, batch_size=1)
+    writer.write(graph)
+    writer.close()
+
+    statements = [s for s, p in driver.statements]
+    assert len(statements) == 5
+    assert all(s.startswith("UNWIND $props AS prop MERGE (n:Base {objectid:prop.id})") for s in statements[:3])
+    assert all("MERGE (n)-[r:MemberOf]->(m)" in s for s in statements[3:])
+    # The nodes of the relationships are looked up, not merged again
+    assert all(s.startswith("UNWIND $props AS prop MATCH (n:Base {objectid:prop.a})") for s in statements[3:])
+    assert writer.report()["User"][:2] == (2, 2)
+    assert writer.report()["MemberOf"][:2] == (2, 2)